@@ -13,12 +13,16 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 from pathlib import Path
 import environ
 
-env = environ.Env()
-environ.Env.read_env()
-
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Read .env from an explicit path, and only when present: containers usually
+# pass the environment directly (or set DJANGO_READ_ENV_FILE=false).
+env = environ.Env()
+ENV_FILE = Path(env("DJANGO_ENV_FILE", default=str(BASE_DIR / "app" / ".env")))
+if env.bool("DJANGO_READ_ENV_FILE", default=True) and ENV_FILE.is_file():
+    environ.Env.read_env(ENV_FILE)
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
 
@@ -44,6 +48,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "inventory.middleware.PerformanceMiddleware",
+    "inventory.middleware.CompressionMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -75,18 +81,72 @@ WSGI_APPLICATION = "app.wsgi.application"
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
+# DB_POOL=true checks connections out of a per-process pool (inventory.pool)
+# and returns them at the end of each request; otherwise connections persist
+# per thread for DB_CONN_MAX_AGE seconds. app/asgi.py defaults DB_CONN_MAX_AGE
+# to 0: under ASGI each request may run on a different thread, so persistent
+# per-thread connections pile up instead of being reused.
+
+DB_POOL = env.bool("DB_POOL", default=False)
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'ENGINE': 'inventory.backends.postgresql' if DB_POOL else 'django.db.backends.postgresql_psycopg2',
         'NAME': env("DB_NAME"),
         'USER': env("DB_USER"),
         'PASSWORD': env("DB_PASSWORD"),
         'HOST': env("DB_HOST"),
         'PORT': env("DB_PORT"),
+        'CONN_MAX_AGE': env.int("DB_CONN_MAX_AGE", default=0 if DB_POOL else 60),
+        'CONN_HEALTH_CHECKS': env.bool("DB_CONN_HEALTH_CHECKS", default=True),
+        'POOL': {
+            'MAX_SIZE': env.int("DB_POOL_MAX_SIZE", default=20),
+            'TIMEOUT': env.float("DB_POOL_TIMEOUT", default=30.0),
+            'MAX_LIFETIME': env.float("DB_POOL_MAX_LIFETIME", default=1800.0),
+            'CHECK_AFTER': env.float("DB_POOL_CHECK_AFTER", default=30.0),
+        },
     }
 }
 
+# Read replicas: DB_REPLICA_HOSTS=host1,host2 adds aliases replica1, replica2
+# with the primary's credentials. inventory.routing.ReplicaRouter sends
+# read-only API actions there; everything else stays on "default".
+for index, host in enumerate(env.list("DB_REPLICA_HOSTS", default=[]), start=1):
+    DATABASES[f"replica{index}"] = {**DATABASES["default"], "HOST": host, "TEST": {"MIRROR": "default"}}
+
+DATABASE_ROUTERS = ["inventory.routing.ReplicaRouter"]
+
+# Trigram lookups and similarity used by book search.
+if "postgresql" in DATABASES["default"]["ENGINE"]:
+    INSTALLED_APPS.append("django.contrib.postgres")
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Local memory by default (LRU eviction once MAX_ENTRIES is reached), which
+# only suits a single worker process. With more workers point CACHE_URL at a
+# shared cache, e.g. redis://host:6379/1, so invalidations reach every worker.
+
+CACHES = {
+    "default": env.cache("CACHE_URL", default="locmemcache://inventory?MAX_ENTRIES=10000"),
+}
+
+# Worker processes serving the app (gunicorn reads the same variable).
+WEB_CONCURRENCY = env.int("WEB_CONCURRENCY", default=1)
+
+# Logging
+# https://docs.djangoproject.com/en/4.2/topics/logging/
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "inventory": {"handlers": ["console"], "level": env("INVENTORY_LOG_LEVEL", default="INFO")},
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -121,7 +181,60 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Uploaded files (bulk stock uploads queued for the import worker)
+
+MEDIA_ROOT = env("MEDIA_ROOT", default=str(BASE_DIR / "media"))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# Inventory
+
+# Number of parsed rows resolved and inserted per batch by the bulk stock import.
+INVENTORY_BULK_CHUNK_SIZE = env.int("INVENTORY_BULK_CHUNK_SIZE", default=1000)
+
+# Seconds without a committed batch after which a running import job is
+# considered abandoned (worker killed) and resumed by another worker.
+INVENTORY_IMPORT_JOB_TIMEOUT = env.int("INVENTORY_IMPORT_JOB_TIMEOUT", default=600)
+
+# Build book list/search responses from .values() rows instead of BookSerializer.
+INVENTORY_LEAN_READS = env.bool("INVENTORY_LEAN_READS", default=True)
+
+# Cache alias and TTL (seconds) for book detail and stock balance reads.
+INVENTORY_CACHE_ALIAS = env("INVENTORY_CACHE_ALIAS", default="default")
+INVENTORY_CACHE_TIMEOUT = env.int("INVENTORY_CACHE_TIMEOUT", default=300)
+
+# TTL (seconds) of cached stock and movement reports. Reports are not
+# invalidated by writes, so keep this short.
+INVENTORY_REPORT_CACHE_TIMEOUT = env.int("INVENTORY_REPORT_CACHE_TIMEOUT", default=60)
+
+# Per-request performance instrumentation (Server-Timing header, JSON log
+# line on "inventory.perf", rolling per-route stats at /metrics).
+INVENTORY_PERF_ENABLED = env.bool("INVENTORY_PERF_ENABLED", default=False)
+INVENTORY_PERF_SAMPLE_RATE = env.float("INVENTORY_PERF_SAMPLE_RATE", default=1.0)
+INVENTORY_PERF_WINDOW = env.int("INVENTORY_PERF_WINDOW", default=1000)
+
+# Database aliases that read-only API actions may use (none: everything reads
+# from the primary). After a write the client reads from the primary for
+# INVENTORY_REPLICA_PIN_SECONDS, which should exceed the usual replica lag.
+INVENTORY_READ_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+INVENTORY_REPLICA_PIN_SECONDS = env.int("INVENTORY_REPLICA_PIN_SECONDS", default=5)
+
+# Compress responses of at least INVENTORY_COMPRESSION_MIN_SIZE bytes with
+# brotli (if installed) or gzip, as the client's Accept-Encoding allows.
+INVENTORY_COMPRESSION_ENABLED = env.bool("INVENTORY_COMPRESSION_ENABLED", default=True)
+INVENTORY_COMPRESSION_MIN_SIZE = env.int("INVENTORY_COMPRESSION_MIN_SIZE", default=1024)
+
+# How long (seconds) bulk upload hashes and Idempotency-Key results are kept;
+# repeats within the window replay the stored response.
+INVENTORY_IDEMPOTENCY_RETENTION = env.int("INVENTORY_IDEMPOTENCY_RETENTION", default=86400)
+
+# Write-behind buffering of /leftover/add/: additions are summed per book in
+# memory and written in one transaction once INVENTORY_ADD_BUFFER_SIZE are
+# pending or every INVENTORY_ADD_BUFFER_INTERVAL seconds (0: size only), and
+# on shutdown. Buffers are per process, so this requires WEB_CONCURRENCY=1.
+INVENTORY_ADD_BUFFER = env.bool("INVENTORY_ADD_BUFFER", default=False)
+INVENTORY_ADD_BUFFER_SIZE = env.int("INVENTORY_ADD_BUFFER_SIZE", default=500)
+INVENTORY_ADD_BUFFER_INTERVAL = env.float("INVENTORY_ADD_BUFFER_INTERVAL", default=1.0)
@@ -0,0 +1,111 @@
+"""Native async versions of the hot read endpoints, served under ``/async/``.
+
+Under ASGI these run on the event loop instead of holding a worker thread for
+the whole request, which suits many slow scanner connections. Responses match
+their DRF counterparts.
+"""
+from django.db.models import Count
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import require_GET
+
+from .cache import acached, book_detail_key
+from .history import aiter_history
+from .models import Book
+from .pagination import BarcodePagination
+from .serializers import BOOK_READ_FIELDS, book_representation
+from .snapshots import annotate_balance_as_of
+from .stock import aget_balance
+from .views import parse_day
+
+
+def bad_request(message):
+    return JsonResponse({'error': message}, status=400)
+
+
+def query_flag(request, name, default):
+    value = request.GET.get(name)
+    if value is None:
+        return default
+    return value.lower() in ('1', 'true', 'yes')
+
+
+@require_GET
+async def ping(request):
+    return JsonResponse({'message': 'pong'})
+
+
+@require_GET
+async def book_detail(request, pk):
+    async def compute():
+        try:
+            return book_representation(await Book.objects.values(*BOOK_READ_FIELDS).aget(pk=pk))
+        except Book.DoesNotExist:
+            raise Http404
+
+    data = dict(await acached('book', book_detail_key(pk), compute, book_id=pk))
+    data['quantity'] = await aget_balance(pk)
+    return JsonResponse(data)
+
+
+@require_GET
+async def book_search(request):
+    """Barcode prefix search, paged by the last barcode seen (``after``)."""
+    barcode = request.GET.get('barcode')
+    if barcode is None:
+        return bad_request('The barcode parameter is required.')
+    try:
+        page_size = min(int(request.GET.get('page_size', BarcodePagination.page_size)),
+                        BarcodePagination.max_page_size)
+    except ValueError:
+        return bad_request('page_size must be an integer.')
+    if page_size < 1:
+        return bad_request('page_size must be positive.')
+
+    books = Book.objects.filter(barcode__startswith=barcode)
+    found = None
+    if query_flag(request, 'count', BarcodePagination.count_by_default):
+        found = (await books.aaggregate(found=Count('id')))['found']
+
+    after = request.GET.get('after')
+    if after:
+        books = books.filter(barcode__gt=after)
+    items = [book_representation(row) async for row in
+             books.order_by('barcode').values(*BOOK_READ_FIELDS)[:page_size + 1]]
+    has_next = len(items) > page_size
+    items = items[:page_size]
+
+    return JsonResponse({
+        'found': found,
+        'after': items[-1]['barcode'] if has_next else None,
+        'items': items,
+    })
+
+
+@require_GET
+async def history(request):
+    try:
+        start_date = parse_day(request.GET.get('start'))
+        end_date = parse_day(request.GET.get('end'))
+        book_id = int(request.GET.get('book', ''))
+    except ValueError:
+        return bad_request('Expected book={id}, start and end as YYYY-MM-DD.')
+
+    # One query for the book and its opening balance.
+    books = Book.objects.filter(id=book_id)
+    fields = ['id', 'barcode', 'title']
+    if start_date is not None:
+        books = annotate_balance_as_of(books, start_date)
+        fields.append('balance')
+    try:
+        book = await books.values(*fields).aget()
+    except Book.DoesNotExist:
+        raise Http404
+    start_balance = book.pop('balance', 0) or 0
+
+    rows = [row async for row in aiter_history(book_id, start_date, end_date, opening=start_balance)]
+    return JsonResponse({
+        'book': book,
+        'start_balance': start_balance,
+        'end_balance': rows[-1]['balance'] if rows else start_balance,
+        'history': rows,
+    })
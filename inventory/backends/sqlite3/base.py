@@ -0,0 +1,7 @@
+from django.db.backends.sqlite3 import base
+
+from inventory.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """Pooled SQLite, a local stand-in for the pooled PostgreSQL backend."""
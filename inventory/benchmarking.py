@@ -0,0 +1,146 @@
+import datetime
+import json
+import math
+import random
+import re
+import time
+from contextlib import contextmanager
+
+from django.utils import timezone
+
+from .models import Author, Book, StoringInformation
+
+TITLE_WORDS = ['Silent', 'River', 'Garden', 'Empire', 'Winter', 'Letters', 'Shadow', 'Harbor', 'Stone', 'Journey',
+               'Midnight', 'Orchard', 'Atlas', 'Lantern', 'Echo', 'Meridian']
+# Deliveries dominate, with occasional sales and corrections.
+QUANTITIES = [1, 2, 3, 5, 10, 20, -1, -1, -2, -3]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def summarize(durations):
+    """Latency summary in milliseconds for a list of durations in seconds."""
+    return {
+        'count': len(durations),
+        'mean_ms': round(sum(durations) / len(durations) * 1000, 3) if durations else 0.0,
+        'p50_ms': round(percentile(durations, 50) * 1000, 3),
+        'p95_ms': round(percentile(durations, 95) * 1000, 3),
+        'p99_ms': round(percentile(durations, 99) * 1000, 3),
+        'max_ms': round(max(durations) * 1000, 3) if durations else 0.0,
+    }
+
+
+WRITE_STATEMENTS = re.compile(r'^\s*(INSERT|UPDATE|DELETE)\b', re.IGNORECASE)
+ROW_LOCK_STATEMENTS = re.compile(r'\bFOR (NO KEY )?UPDATE\b', re.IGNORECASE)
+
+
+class StatementTimer:
+    """``connection.execute_wrapper`` hook accumulating time spent in statements matching ``pattern``."""
+
+    def __init__(self, pattern=WRITE_STATEMENTS):
+        self.pattern = pattern
+        self.elapsed = 0.0
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if not self.pattern.search(sql):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.elapsed += time.perf_counter() - started
+            self.count += 1
+
+    def reset(self):
+        self.elapsed = 0.0
+        self.count = 0
+
+
+def lock_wait_timer(connection):
+    """Time the statements that block while another transaction holds the lock.
+
+    That is ``SELECT ... FOR UPDATE``; SQLite has no row locks and blocks at
+    the first write of a transaction instead.
+    """
+    return StatementTimer(ROW_LOCK_STATEMENTS if connection.features.has_select_for_update else WRITE_STATEMENTS)
+
+
+@contextmanager
+def stopwatch(durations):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        durations.append(time.perf_counter() - started)
+
+
+def write_report(stdout, report, output=None):
+    text = json.dumps(report, indent=2, default=str)
+    if output:
+        with open(output, 'w') as f:
+            f.write(text + '\n')
+    stdout.write(text)
+
+
+@contextmanager
+def backdated_timestamps():
+    """Let seeded ledger rows keep their own ``timestamp`` instead of ``auto_now_add``."""
+    field = StoringInformation._meta.get_field('timestamp')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def seed_inventory(authors=100, books=10_000, ledger_rows=100_000, days=365, batch_size=5000, seed=None, stdout=None):
+    rng = random.Random(seed)
+    run = rng.randrange(10_000)
+    now = timezone.now()
+
+    author_objs = Author.objects.bulk_create(
+        [Author(name=f'Author {run}-{i}', birth_date=datetime.date(1950, 1, 1) + datetime.timedelta(days=i % 15000))
+         for i in range(authors)],
+        batch_size=batch_size,
+    )
+
+    book_ids = []
+    for start in range(0, books, batch_size):
+        created = Book.objects.bulk_create([
+            Book(
+                barcode=f'{run:04d}{i:09d}',
+                title=f'{rng.choice(TITLE_WORDS)} {rng.choice(TITLE_WORDS)} {i}',
+                publish_year=rng.randint(1900, now.year),
+                author=rng.choice(author_objs),
+            )
+            for i in range(start, min(start + batch_size, books))
+        ])
+        book_ids.extend(book.pk for book in created)
+        if stdout:
+            stdout.write(f'{len(book_ids)} books')
+
+    inserted = 0
+    with backdated_timestamps():
+        while inserted < ledger_rows:
+            size = min(batch_size, ledger_rows - inserted)
+            StoringInformation.objects.bulk_create([
+                StoringInformation(
+                    book_id=rng.choice(book_ids),
+                    quantity=rng.choice(QUANTITIES),
+                    timestamp=now - datetime.timedelta(seconds=rng.randrange(days * 86400)),
+                )
+                for _ in range(size)
+            ])
+            inserted += size
+            if stdout:
+                stdout.write(f'{inserted} ledger rows')
+
+    return {'run': run, 'barcode_prefix': f'{run:04d}', 'authors': len(author_objs), 'books': len(book_ids),
+            'ledger_rows': inserted, 'book_ids': book_ids}
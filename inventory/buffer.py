@@ -0,0 +1,152 @@
+import atexit
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import close_old_connections, transaction
+
+from .models import StoringInformation
+
+logger = logging.getLogger(__name__)
+
+MULTI_PROCESS_ERROR = (
+    'INVENTORY_ADD_BUFFER keeps additions in the memory of one process, so with WEB_CONCURRENCY > 1 the other '
+    'workers neither see them in balances nor flush them before a removal.'
+)
+
+_lock = threading.Lock()
+_buffer = None
+
+
+class StockBuffer:
+    """Per-process write-behind buffer for stock additions.
+
+    Deltas are summed per book and written as one ledger row per book, in a
+    single transaction, once ``max_size`` movements are pending or every
+    ``interval`` seconds. ``delta`` keeps counting them until their flush
+    has committed; a failed flush puts them back.
+    """
+
+    def __init__(self, max_size=500, interval=1.0):
+        self.max_size = max_size
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.pending = Counter()
+        self.flushing = Counter()
+        self.count = 0
+        self.stats = Counter()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def add(self, book_id, quantity):
+        # Buffered once the surrounding transaction commits, so a rolled-back
+        # request adds nothing.
+        transaction.on_commit(lambda: self.append(book_id, quantity))
+
+    def append(self, book_id, quantity):
+        with self.lock:
+            self.pending[book_id] += quantity
+            self.count += 1
+            self.stats['movements'] += 1
+            full = self.count >= self.max_size
+            if self.thread is None and self.interval:
+                self.thread = threading.Thread(target=self.run, name='inventory-stock-buffer', daemon=True)
+                self.thread.start()
+        if full:
+            self.flush()
+
+    def delta(self, book_id):
+        with self.lock:
+            return self.pending.get(book_id, 0) + self.flushing.get(book_id, 0)
+
+    def flush(self, book_ids=None):
+        with self.flush_lock:
+            with self.lock:
+                if book_ids is None:
+                    taken, self.pending = self.pending, Counter()
+                else:
+                    taken = Counter({book_id: self.pending.pop(book_id) for book_id in book_ids
+                                     if book_id in self.pending})
+                if not self.pending:
+                    self.count = 0
+                deltas = {book_id: delta for book_id, delta in taken.items() if delta}
+                self.flushing.update(deltas)
+
+            try:
+                if deltas:
+                    with transaction.atomic():
+                        # Registered ahead of the ledger's cache invalidation,
+                        # so no read can count the rows and the deltas at once.
+                        transaction.on_commit(lambda: self.settle(deltas))
+                        StoringInformation.objects.bulk_create(
+                            [StoringInformation(book_id=book_id, quantity=delta)
+                             for book_id, delta in sorted(deltas.items())]
+                        )
+                    self.stats['flushes'] += 1
+                    self.stats['rows'] += len(deltas)
+            except Exception:
+                with self.lock:
+                    self.pending.update(deltas)
+                self.settle(deltas)
+                raise
+        return len(deltas)
+
+    def settle(self, deltas):
+        with self.lock:
+            self.flushing.subtract(deltas)
+            for book_id in deltas:
+                if not self.flushing[book_id]:
+                    del self.flushing[book_id]
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Flushing buffered stock additions failed')
+            finally:
+                close_old_connections()
+
+    def close(self):
+        self.stopped.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.flush()
+
+
+def get_buffer():
+    global _buffer
+    if not settings.INVENTORY_ADD_BUFFER:
+        return None
+    if settings.WEB_CONCURRENCY > 1:
+        raise ImproperlyConfigured(MULTI_PROCESS_ERROR)
+    with _lock:
+        if _buffer is None:
+            _buffer = StockBuffer(
+                max_size=settings.INVENTORY_ADD_BUFFER_SIZE,
+                interval=settings.INVENTORY_ADD_BUFFER_INTERVAL,
+            )
+        return _buffer
+
+
+def buffered_delta(book_id):
+    buffer = _buffer
+    return buffer.delta(book_id) if buffer is not None else 0
+
+
+def flush_buffer(book_ids=None):
+    buffer = _buffer
+    return buffer.flush(book_ids) if buffer is not None else 0
+
+
+@atexit.register
+def close_buffer():
+    """Stop the flush thread and write out everything still buffered."""
+    global _buffer
+    with _lock:
+        buffer, _buffer = _buffer, None
+    if buffer is not None:
+        buffer.close()
@@ -0,0 +1,134 @@
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .routing import reading_from_replica
+
+MISSING = object()
+
+_lock = threading.Lock()
+_hits = Counter()
+_misses = Counter()
+
+
+def get_cache():
+    return caches[settings.INVENTORY_CACHE_ALIAS]
+
+
+def book_detail_key(book_id):
+    return f'inventory:book:{book_id}'
+
+
+def stock_key(book_id):
+    return f'inventory:stock:{book_id}'
+
+
+def book_validators_key(book_id):
+    return f'inventory:book-validators:{book_id}'
+
+
+def fill_timeout(timeout):
+    timeout = settings.INVENTORY_CACHE_TIMEOUT if timeout is None else timeout
+    if reading_from_replica():
+        # A lagging replica can return data from before the last invalidation;
+        # keep such entries no longer than the read-your-writes window.
+        timeout = min(timeout, settings.INVENTORY_REPLICA_PIN_SECONDS)
+    return timeout
+
+
+def book_generation_key(book_id):
+    return f'inventory:book-generation:{book_id}'
+
+
+def book_generation(book_id):
+    return get_cache().get(book_generation_key(book_id), 0)
+
+
+def book_entry_keys(key, book_id):
+    return [key] if book_id is None else [key, book_generation_key(book_id)]
+
+
+def read_entry(values, key, book_id):
+    """Return ``(value, generation)`` from a ``get_many`` result; entries of an older generation are misses."""
+    if book_id is None:
+        return values.get(key, MISSING), None
+    generation = values.get(book_generation_key(book_id), 0)
+    entry = values.get(key)
+    if entry is None or entry[0] != generation:
+        return MISSING, generation
+    return entry[1], generation
+
+
+def make_entry(value, generation):
+    return value if generation is None else (generation, value)
+
+
+def count(namespace, value):
+    with _lock:
+        (_misses if value is MISSING else _hits)[namespace] += 1
+
+
+def cached(namespace, key, compute, timeout=None, book_id=None):
+    """Cache-aside read of ``compute()``.
+
+    Entries of ``book_id`` are stored with the book's generation, read in the
+    same round trip. Invalidation bumps the generation, so a value computed
+    from rows read before a commit is never served after it, even when it is
+    stored after the invalidation ran.
+    """
+    cache = get_cache()
+    value, generation = read_entry(cache.get_many(book_entry_keys(key, book_id)), key, book_id)
+    count(namespace, value)
+    if value is MISSING:
+        value = compute()
+        cache.set(key, make_entry(value, generation), fill_timeout(timeout))
+    return value
+
+
+async def acached(namespace, key, compute, timeout=None, book_id=None):
+    """``cached`` for async views; ``compute`` is a coroutine function."""
+    cache = get_cache()
+    value, generation = read_entry(await cache.aget_many(book_entry_keys(key, book_id)), key, book_id)
+    count(namespace, value)
+    if value is MISSING:
+        value = await compute()
+        await cache.aset(key, make_entry(value, generation), fill_timeout(timeout))
+    return value
+
+
+def invalidate_books(book_ids):
+    cache = get_cache()
+    keys = []
+    for book_id in book_ids:
+        generation_key = book_generation_key(book_id)
+        try:
+            cache.incr(generation_key)
+        except ValueError:
+            if not cache.add(generation_key, 1, None):
+                cache.incr(generation_key)
+        keys += [book_detail_key(book_id), stock_key(book_id), book_validators_key(book_id)]
+    if keys:
+        cache.delete_many(keys)
+
+
+def invalidate_books_on_commit(book_ids):
+    # Dropping entries before commit would let a concurrent reader cache the
+    # still-committed old value again, so wait until the write is visible.
+    book_ids = list(book_ids)
+    transaction.on_commit(lambda: invalidate_books(book_ids))
+
+
+def cache_stats():
+    with _lock:
+        namespaces = sorted(set(_hits) | set(_misses))
+        return {
+            namespace: {
+                'hits': _hits[namespace],
+                'misses': _misses[namespace],
+                'hit_ratio': round(_hits[namespace] / ((_hits[namespace] + _misses[namespace]) or 1), 3),
+            }
+            for namespace in namespaces
+        }
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.checks import Error, Warning, register
+
+from .buffer import MULTI_PROCESS_ERROR
+
+LOCAL_CACHE_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+@register()
+def shared_cache_check(app_configs, **kwargs):
+    backend = settings.CACHES[settings.INVENTORY_CACHE_ALIAS]['BACKEND']
+    if settings.WEB_CONCURRENCY > 1 and backend == LOCAL_CACHE_BACKEND:
+        return [Warning(
+            'The inventory cache is local to each worker process, so invalidations do not reach the other workers '
+            'and they serve stale books and balances until the entries expire.',
+            hint='Set CACHE_URL to a shared cache such as redis://host:6379/1.',
+            id='inventory.W001',
+        )]
+    return []
+
+
+@register()
+def add_buffer_check(app_configs, **kwargs):
+    if settings.INVENTORY_ADD_BUFFER and settings.WEB_CONCURRENCY > 1:
+        return [Error(
+            MULTI_PROCESS_ERROR,
+            hint='Turn INVENTORY_ADD_BUFFER off or run a single worker process.',
+            id='inventory.E001',
+        )]
+    return []
@@ -0,0 +1,49 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.sha1(repr(parts).encode()).hexdigest())
+
+
+class ConditionalReadMixin:
+    """ETag/Last-Modified on reads, checked before anything is serialized.
+
+    List pages are tagged from ``page_validators`` of the rows already
+    fetched for the page; views tag single objects through ``conditional``.
+    """
+
+    def conditional(self, request, etag, last_modified, respond):
+        # Each representation of the resource needs its own tag.
+        renderer = getattr(request, 'accepted_renderer', None)
+        if renderer is not None and renderer.format != 'json':
+            etag = f'{etag[:-1]}-{renderer.format}"'
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = respond()
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+            patch_vary_headers(response, ('Accept',))
+        return response
+
+    def page_validators(self, obj):
+        return obj.pk, obj.updated_at
+
+    def conditional_page(self, paginator, page, respond):
+        etag = make_etag(
+            self.request.get_full_path(), [self.page_validators(row) for row in page],
+            paginator.get_next_link(), paginator.get_previous_link(), getattr(paginator, 'count', None),
+        )
+        # No Last-Modified: deleting a row would not move it.
+        return self.conditional(self.request, etag, None, respond)
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        return self.conditional_page(self.paginator, page, lambda: self.get_paginated_response(
+            self.get_serializer(page, many=True).data
+        ))
@@ -0,0 +1,89 @@
+import csv
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
+
+from .models import Book, StoringInformation
+from .renderers import msgpack, msgpack_default
+
+EXPORT_CHUNK_SIZE = 2000
+
+BOOK_EXPORT_FIELDS = ['id', 'barcode', 'title', 'publish_year', 'author_name', 'author_birth_date', 'quantity']
+LEDGER_EXPORT_FIELDS = ['id', 'book_id', 'barcode', 'quantity', 'timestamp']
+
+
+def book_export_rows():
+    queryset = Book.objects.order_by('id').annotate(
+        author_name=F('author__name'),
+        author_birth_date=F('author__birth_date'),
+        quantity=Coalesce('stock__quantity', Value(0)),
+    ).values_list(*BOOK_EXPORT_FIELDS)
+    return queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def ledger_export_rows(start=None, end=None, book_id=None):
+    queryset = StoringInformation.objects.all()
+    if book_id:
+        queryset = queryset.filter(book_id=book_id)
+    if start:
+        queryset = queryset.filter(timestamp__gte=start)
+    if end:
+        queryset = queryset.filter(timestamp__lte=end)
+
+    queryset = queryset.order_by('timestamp', 'id').annotate(
+        barcode=F('book__barcode'),
+    ).values_list(*LEDGER_EXPORT_FIELDS)
+    return queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def iter_csv(fields, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def iter_ndjson(fields, rows):
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(dict(zip(fields, row))) + '\n'
+
+
+def iter_columnar(fields, rows):
+    """One JSON object of per-field arrays per ``EXPORT_CHUNK_SIZE`` rows, newline separated."""
+    encoder = DjangoJSONEncoder()
+    rows = iter(rows)
+    while chunk := list(islice(rows, EXPORT_CHUNK_SIZE)):
+        yield encoder.encode(dict(zip(fields, (list(column) for column in zip(*chunk))))) + '\n'
+
+
+def iter_msgpack(fields, rows):
+    """A stream of MessagePack arrays: the field names, then one array per row."""
+    packer = msgpack.Packer(default=msgpack_default)
+    yield packer.pack(fields)
+    for row in rows:
+        yield packer.pack(row)
+
+
+EXPORT_FORMATS = {
+    'ndjson': (iter_ndjson, 'application/x-ndjson'),
+    'csv': (iter_csv, 'text/csv'),
+    'columnar': (iter_columnar, 'application/vnd.inventory.columnar+x-ndjson'),
+}
+if msgpack is not None:
+    EXPORT_FORMATS['msgpack'] = (iter_msgpack, 'application/msgpack')
+
+
+def streaming_export(fields, rows, output, filename):
+    render, content_type = EXPORT_FORMATS[output]
+    response = StreamingHttpResponse(render(fields, rows), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{output}"'
+    return response
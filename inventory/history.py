@@ -0,0 +1,37 @@
+from django.db.models import F, Sum, Window
+from django.utils import timezone
+
+from .models import StoringInformation
+
+HISTORY_CHUNK_SIZE = 2000
+
+
+def history_queryset(book_id, start=None, end=None):
+    queryset = StoringInformation.objects.filter(book_id=book_id)
+    if start:
+        queryset = queryset.filter(timestamp__gte=start)
+    if end:
+        queryset = queryset.filter(timestamp__lte=end)
+
+    ordering = [F('timestamp').asc(), F('id').asc()]
+    return queryset.annotate(
+        running=Window(Sum('quantity'), order_by=ordering),
+    ).order_by(*ordering).values('quantity', 'timestamp', 'running')
+
+
+def history_row(row, opening):
+    return {
+        'quantity': row['quantity'],
+        'timestamp': timezone.localtime(row['timestamp']).strftime('%Y-%m-%d'),
+        'balance': opening + row['running'],
+    }
+
+
+def iter_history(book_id, start=None, end=None, opening=0):
+    for row in history_queryset(book_id, start, end).iterator(chunk_size=HISTORY_CHUNK_SIZE):
+        yield history_row(row, opening)
+
+
+async def aiter_history(book_id, start=None, end=None, opening=0):
+    async for row in history_queryset(book_id, start, end).aiterator(chunk_size=HISTORY_CHUNK_SIZE):
+        yield history_row(row, opening)
@@ -0,0 +1,83 @@
+import datetime
+import hashlib
+import json
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .jobs import retry_job
+from .models import IdempotencyRecord, ImportJob
+
+REPLAY_HEADER = 'Idempotent-Replayed'
+
+
+def file_digest(uploaded_file):
+    digest = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        digest.update(chunk)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+
+def request_fingerprint(data):
+    payload = {key: data.getlist(key) if hasattr(data, 'getlist') else data[key] for key in data}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def retention_cutoff():
+    return timezone.now() - datetime.timedelta(seconds=settings.INVENTORY_IDEMPOTENCY_RETENTION)
+
+
+def purge_expired():
+    return IdempotencyRecord.objects.filter(created_at__lt=retention_cutoff()).delete()[0]
+
+
+def replay(record):
+    if record.job_id is not None:
+        # Report the job's current state rather than the original "pending".
+        job = ImportJob.objects.get(id=record.job_id)
+        if job.status == ImportJob.FAILED:
+            # Retrying the upload retries the job, from its last committed
+            # batch, instead of replaying the failure for the whole window.
+            retry_job(job.id)
+            job.refresh_from_db()
+        response = Response({'job': job.id, 'status': job.status}, status=record.status_code)
+    else:
+        response = Response(record.response, status=record.status_code)
+    response[REPLAY_HEADER] = 'true'
+    return response
+
+
+def idempotent(key, fingerprint, respond):
+    """Run ``respond`` once per ``key`` within the retention window and replay its response afterwards.
+
+    The record is inserted in the same transaction as the work, so a
+    concurrent duplicate waits on the unique key and then replays the
+    committed result, and a failed attempt leaves nothing behind. Only
+    successful responses are stored.
+    """
+    with transaction.atomic():
+        IdempotencyRecord.objects.filter(key=key, created_at__lt=retention_cutoff()).delete()
+        try:
+            with transaction.atomic():
+                record = IdempotencyRecord.objects.create(key=key, fingerprint=fingerprint)
+        except IntegrityError:
+            record = IdempotencyRecord.objects.get(key=key)
+            if record.fingerprint != fingerprint:
+                return Response({'error': 'Idempotency key reused with a different request'},
+                                status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+            return replay(record)
+
+        response = respond()
+        if response.status_code >= 400:
+            transaction.set_rollback(True)
+            return response
+
+        record.status_code = response.status_code
+        record.response = response.data
+        record.job_id = response.data.get('job') if isinstance(response.data, dict) else None
+        record.save(update_fields=['status_code', 'response', 'job'])
+        return response
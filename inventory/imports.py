@@ -0,0 +1,76 @@
+from contextlib import nullcontext
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Book, StoringInformation
+
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportResult:
+    def __init__(self, processed=0, imported=0, error_count=0, errors=None):
+        self.processed = processed
+        self.imported = imported
+        self.error_count = error_count
+        self.errors = list(errors or [])
+
+    def add_error(self, row, barcode, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row, 'barcode': barcode, 'error': message})
+
+    def as_dict(self):
+        return {'imported': self.imported, 'error_count': self.error_count, 'errors': self.errors}
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def import_rows(rows, chunk_size=None, atomic=True, on_batch=None, result=None):
+    """Insert ``(row, barcode, quantity)`` tuples into the ledger in batches.
+
+    Unknown barcodes and invalid quantities are collected as per-row errors.
+    With ``atomic`` every valid row is imported within a single transaction,
+    otherwise each batch commits on its own, together with ``on_batch``, so
+    progress is visible to others and records exactly how far the import got.
+    ``result`` carries the counts of an earlier partial run on.
+    """
+    chunk_size = chunk_size or settings.INVENTORY_BULK_CHUNK_SIZE
+    result = result or ImportResult()
+
+    with transaction.atomic() if atomic else nullcontext():
+        for batch in batched(rows, chunk_size):
+            with nullcontext() if atomic else transaction.atomic():
+                import_batch(batch, result)
+                if on_batch is not None:
+                    on_batch(result)
+    return result
+
+
+def import_batch(batch, result):
+    barcodes = {barcode for _, barcode, _ in batch if barcode}
+    book_ids = dict(Book.objects.filter(barcode__in=barcodes).values_list('barcode', 'id'))
+
+    entries = []
+    for row, barcode, quantity in batch:
+        if not barcode:
+            result.add_error(row, barcode, 'Barcode is missing')
+            continue
+        try:
+            quantity = int(quantity)
+        except (TypeError, ValueError):
+            result.add_error(row, barcode, 'Quantity must be a valid integer')
+            continue
+        if barcode not in book_ids:
+            result.add_error(row, barcode, 'Unknown barcode')
+            continue
+        entries.append(StoringInformation(book_id=book_ids[barcode], quantity=quantity))
+
+    StoringInformation.objects.bulk_create(entries)
+    result.imported += len(entries)
+    result.processed += len(batch)
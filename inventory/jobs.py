@@ -0,0 +1,93 @@
+import datetime
+import logging
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .imports import ImportResult, import_rows
+from .models import ImportJob
+from .parsers import PARSERS
+
+logger = logging.getLogger(__name__)
+
+
+class JobLost(Exception):
+    """Another worker reclaimed the job while this one was still running it."""
+
+
+def enqueue_import(uploaded_file, file_format):
+    return ImportJob.objects.create(file=uploaded_file, file_format=file_format)
+
+
+def claim_next_job():
+    stale = timezone.now() - datetime.timedelta(seconds=settings.INVENTORY_IMPORT_JOB_TIMEOUT)
+    candidates = ImportJob.objects.filter(
+        Q(status=ImportJob.PENDING) | Q(status=ImportJob.RUNNING, heartbeat_at__lt=stale)
+    ).order_by('id').values_list('id', 'status', 'heartbeat_at')[:10]
+    for job_id, status, heartbeat in candidates:
+        now = timezone.now()
+        changes = {'status': ImportJob.RUNNING, 'heartbeat_at': now}
+        if status == ImportJob.PENDING:
+            changes['started_at'] = now
+        # The conditional update is the claim: only one worker sees it succeed.
+        claimed = ImportJob.objects.filter(id=job_id, status=status, heartbeat_at=heartbeat).update(**changes)
+        if claimed:
+            if status == ImportJob.RUNNING:
+                logger.warning('Resuming abandoned import %s', job_id)
+            return ImportJob.objects.get(id=job_id)
+    return None
+
+
+def run_job(job):
+    """Import the job's file, resuming after the rows committed by an earlier attempt."""
+    heartbeat = job.heartbeat_at
+
+    def report_progress(result):
+        nonlocal heartbeat
+        now = timezone.now()
+        # Runs inside the batch transaction, so rows_processed is exactly the
+        # committed offset, and a worker that lost the job rolls its batch back.
+        updated = ImportJob.objects.filter(id=job.id, heartbeat_at=heartbeat).update(
+            rows_processed=result.processed, imported=result.imported, error_count=result.error_count,
+            errors=result.errors, heartbeat_at=now,
+        )
+        if not updated:
+            raise JobLost(f'Import {job.id} was reclaimed by another worker')
+        heartbeat = now
+
+    result = ImportResult(job.rows_processed, job.imported, job.error_count, job.errors)
+    try:
+        with job.file.open('rb') as uploaded_file:
+            rows = islice(PARSERS[job.file_format](uploaded_file), job.rows_processed, None)
+            result = import_rows(rows, atomic=False, on_batch=report_progress, result=result)
+    except JobLost:
+        logger.warning('Import job %s was reclaimed by another worker', job.id)
+        job.refresh_from_db()
+        return job
+    except Exception as e:
+        logger.exception('Import job %s failed', job.id)
+        ImportJob.objects.filter(id=job.id, heartbeat_at=heartbeat).update(
+            status=ImportJob.FAILED, message=str(e), finished_at=timezone.now(),
+        )
+        job.refresh_from_db()
+        return job
+
+    job.status = ImportJob.DONE
+    job.rows_processed = result.processed
+    job.imported = result.imported
+    job.error_count = result.error_count
+    job.errors = result.errors
+    job.heartbeat_at = heartbeat
+    job.finished_at = timezone.now()
+    job.save()
+    job.file.delete(save=False)
+    return job
+
+
+def retry_job(job_id):
+    """Queue a failed job again; it resumes after the last committed batch."""
+    return ImportJob.objects.filter(id=job_id, status=ImportJob.FAILED).update(
+        status=ImportJob.PENDING, message='', finished_at=None, heartbeat_at=None,
+    )
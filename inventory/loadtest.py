@@ -0,0 +1,259 @@
+import asyncio
+import datetime
+import io
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import openpyxl
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import close_old_connections, connection, connections
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from .benchmarking import summarize
+from .models import Book
+
+
+class BenchmarkContext:
+    """Sample data shared by the scenarios: known barcodes and ids plus generated upload fixtures."""
+
+    def __init__(self, sample_size=1000, bulk_rows=1000, seed=None):
+        self.rng = random.Random(seed)
+        self.books = list(Book.objects.exclude(barcode=None).order_by('-id').values_list('id', 'barcode')[:sample_size])
+        if not self.books:
+            raise ValueError('No books with barcodes to benchmark; seed some first.')
+        self.xlsx = self.build_xlsx(bulk_rows)
+        self.txt = self.build_txt(bulk_rows)
+        self.lock = threading.Lock()
+
+    def book(self):
+        with self.lock:
+            return self.rng.choice(self.books)
+
+    def bulk_sample(self, rows):
+        return [(self.rng.choice(self.books)[1], self.rng.randint(1, 5)) for _ in range(rows)]
+
+    def build_xlsx(self, rows):
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        for barcode, quantity in self.bulk_sample(rows):
+            sheet.append([barcode, quantity])
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+        return buffer.getvalue()
+
+    def build_txt(self, rows):
+        return ''.join(f'BRC{barcode}\nQNT{quantity}\n' for barcode, quantity in self.bulk_sample(rows)).encode()
+
+
+def ping(client, ctx):
+    return client.get('/ping')
+
+
+def retrieve(client, ctx):
+    book_id, _ = ctx.book()
+    return client.get(f'/book/{book_id}/')
+
+
+def barcode_search(client, ctx):
+    _, barcode = ctx.book()
+    return client.get('/book/', {'barcode': barcode[:-2]})
+
+
+def history(client, ctx):
+    book_id, _ = ctx.book()
+    end = timezone.localdate()
+    start = end - datetime.timedelta(days=30)
+    return client.get('/leftover/history/', {'book': book_id, 'start': start.isoformat(), 'end': end.isoformat()})
+
+
+def add(client, ctx):
+    _, barcode = ctx.book()
+    return client.post('/leftover/add/', {'barcode': barcode, 'quantity': 1})
+
+
+def remove(client, ctx):
+    _, barcode = ctx.book()
+    return client.post('/leftover/remove/', {'barcode': barcode, 'quantity': 1})
+
+
+# The fixtures are the same bytes on every call; without dedupe=0 every
+# upload after the first would replay the stored result instead of importing.
+def bulk_xlsx(client, ctx):
+    upload = SimpleUploadedFile('stock.xlsx', ctx.xlsx)
+    return client.post('/leftover/bulk/?dedupe=0', {'file': upload})
+
+
+def bulk_txt(client, ctx):
+    upload = SimpleUploadedFile('stock.txt', ctx.txt)
+    return client.post('/leftover/bulk/?dedupe=0', {'file': upload})
+
+
+SCENARIOS = {
+    'retrieve': retrieve,
+    'barcode_search': barcode_search,
+    'history': history,
+    'add': add,
+    'remove': remove,
+    'bulk_xlsx': bulk_xlsx,
+    'bulk_txt': bulk_txt,
+}
+
+
+# The load driver can also hit endpoints that run no queries.
+LOAD_SCENARIOS = {**SCENARIOS, 'ping': ping}
+
+
+async def async_retrieve(client, ctx):
+    book_id, _ = ctx.book()
+    return await client.get(f'/async/book/{book_id}/')
+
+
+async def async_barcode_search(client, ctx):
+    _, barcode = ctx.book()
+    return await client.get('/async/book/', {'barcode': barcode[:-2]})
+
+
+async def async_history(client, ctx):
+    book_id, _ = ctx.book()
+    end = timezone.localdate()
+    start = end - datetime.timedelta(days=30)
+    return await client.get('/async/leftover/history/',
+                            {'book': book_id, 'start': start.isoformat(), 'end': end.isoformat()})
+
+
+ASYNC_SCENARIOS = {
+    'retrieve': async_retrieve,
+    'barcode_search': async_barcode_search,
+    'history': async_history,
+}
+
+
+def make_client():
+    # Management commands run without the test environment, so "testserver"
+    # is not an allowed host.
+    return Client(HTTP_HOST='localhost')
+
+
+def run_scenario(scenario, ctx, iterations, warmup=3):
+    """Run ``scenario`` sequentially, recording latency and queries per request."""
+    client = make_client()
+    for _ in range(warmup):
+        scenario(client, ctx)
+
+    durations, queries, errors = [], [], 0
+    started = time.perf_counter()
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            request_started = time.perf_counter()
+            response = scenario(client, ctx)
+            durations.append(time.perf_counter() - request_started)
+        queries.append(len(captured.captured_queries))
+        # 400 on remove just means the sampled book ran out of stock.
+        errors += response.status_code >= 500
+    wall = time.perf_counter() - started
+
+    return {
+        'latency': summarize(durations),
+        'throughput_per_second': round(iterations / wall, 1) if wall else 0.0,
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else 0.0,
+        'max_queries': max(queries, default=0),
+        'errors': errors,
+    }
+
+
+def run_load(scenarios, ctx, requests, workers, latency=0.0, recycle_connections=False):
+    """Fire ``requests`` randomly mixed scenario calls from ``workers`` threads.
+
+    ``latency`` seconds of simulated client I/O are spent holding the worker,
+    as a threaded WSGI server does for a slow connection. The test client
+    keeps database connections open across requests; ``recycle_connections``
+    applies ``CONN_MAX_AGE`` around each request as a real server does.
+    """
+    local = threading.local()
+    lock = threading.Lock()
+    durations, errors = [], 0
+
+    def call(_):
+        nonlocal errors
+        if not hasattr(local, 'client'):
+            local.client = make_client()
+        scenario = LOAD_SCENARIOS[ctx.rng.choice(scenarios)]
+        request_started = time.perf_counter()
+        try:
+            if latency:
+                time.sleep(latency)
+            if recycle_connections:
+                close_old_connections()
+            failed = scenario(local.client, ctx).status_code >= 500
+            if recycle_connections:
+                close_old_connections()
+        except Exception:
+            failed = True
+        elapsed = time.perf_counter() - request_started
+        with lock:
+            durations.append(elapsed)
+            errors += failed
+
+    def close_connections():
+        connections.close_all()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(call, range(requests)))
+        list(pool.map(lambda _: close_connections(), range(workers)))
+    wall = time.perf_counter() - started
+
+    return {
+        'scenarios': scenarios,
+        'workers': workers,
+        'requests': requests,
+        'latency': summarize(durations),
+        'throughput_per_second': round(requests / wall, 1) if wall else 0.0,
+        'errors': errors,
+    }
+
+
+def run_async_load(scenarios, ctx, requests, concurrency, latency=0.0):
+    """``run_load`` against the async views: ``concurrency`` connections multiplexed on one event loop."""
+    durations, errors = [], 0
+
+    async def call(client, semaphore):
+        nonlocal errors
+        async with semaphore:
+            scenario = ASYNC_SCENARIOS[ctx.rng.choice(scenarios)]
+            request_started = time.perf_counter()
+            try:
+                if latency:
+                    await asyncio.sleep(latency)
+                failed = (await scenario(client, ctx)).status_code >= 500
+            except Exception:
+                failed = True
+            durations.append(time.perf_counter() - request_started)
+            errors += failed
+
+    async def main():
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+        await asyncio.gather(*(call(client, semaphore) for _ in range(requests)))
+
+    # AsyncClient always sends "Host: testserver"; allow it the way the test
+    # environment does.
+    started = time.perf_counter()
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        asyncio.run(main())
+    wall = time.perf_counter() - started
+    connections.close_all()
+
+    return {
+        'scenarios': scenarios,
+        'concurrency': concurrency,
+        'requests': requests,
+        'latency': summarize(durations),
+        'throughput_per_second': round(requests / wall, 1) if wall else 0.0,
+        'errors': errors,
+    }
@@ -0,0 +1,77 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from inventory.benchmarking import write_report
+from inventory.loadtest import LOAD_SCENARIOS, SCENARIOS, BenchmarkContext, run_load, run_scenario
+
+READ_SCENARIOS = ['retrieve', 'barcode_search', 'history']
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the inventory API: per-endpoint latency and query counts, then a concurrent mixed load.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', dest='scenarios', choices=sorted(SCENARIOS),
+                            help='Only run this micro-benchmark (repeatable).')
+        parser.add_argument('--iterations', type=int, default=200, help='Requests per micro-benchmark.')
+        parser.add_argument('--bulk-iterations', type=int, default=5, help='Requests per bulk upload benchmark.')
+        parser.add_argument('--bulk-rows', type=int, default=1000, help='Rows in the generated bulk fixtures.')
+        parser.add_argument('--load-requests', type=int, default=1000, help='Requests fired by the load driver.')
+        parser.add_argument('--workers', type=int, default=16, help='Concurrent threads of the load driver.')
+        parser.add_argument('--load-scenario', action='append', dest='load_scenarios', choices=sorted(LOAD_SCENARIOS),
+                            help='Scenarios mixed by the load driver (default: read endpoints).')
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--output', help='Write the JSON results to this file.')
+        parser.add_argument('--compare', help='Previous JSON results to compare against.')
+
+    def handle(self, *args, **options):
+        try:
+            ctx = BenchmarkContext(bulk_rows=options['bulk_rows'], seed=options['seed'])
+        except ValueError as e:
+            raise CommandError(f'{e} Run `manage.py seed_inventory` first.')
+
+        report = {
+            'meta': {
+                'started_at': timezone.now().isoformat(),
+                'vendor': connection.vendor,
+                'options': {key: options[key] for key in ('iterations', 'bulk_rows', 'load_requests', 'workers')},
+            },
+            'scenarios': {},
+        }
+        for name in options['scenarios'] or list(SCENARIOS):
+            iterations = options['bulk_iterations'] if name.startswith('bulk') else options['iterations']
+            self.stderr.write(f'Running {name} x{iterations}')
+            report['scenarios'][name] = run_scenario(SCENARIOS[name], ctx, iterations)
+
+        if options['load_requests']:
+            load_scenarios = options['load_scenarios'] or READ_SCENARIOS
+            self.stderr.write(f'Running load: {options["load_requests"]} requests, {options["workers"]} workers')
+            report['load'] = run_load(load_scenarios, ctx, options['load_requests'], options['workers'])
+
+        write_report(self.stdout, report, options['output'])
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                self.write_comparison(json.load(f), report)
+
+    def write_comparison(self, baseline, report):
+        self.stdout.write('\nscenario             p50 ms (before -> after)    p99 ms (before -> after)    queries')
+        rows = dict(report['scenarios'])
+        if 'load' in report:
+            rows['load'] = report['load']
+        for name, result in rows.items():
+            before = baseline['load'] if name == 'load' else baseline.get('scenarios', {}).get(name)
+            if not before:
+                continue
+            self.stdout.write(
+                f'{name:<20} {self.delta(before["latency"]["p50_ms"], result["latency"]["p50_ms"]):<27} '
+                f'{self.delta(before["latency"]["p99_ms"], result["latency"]["p99_ms"]):<27} '
+                f'{before.get("queries_per_request", "-")} -> {result.get("queries_per_request", "-")}'
+            )
+
+    def delta(self, before, after):
+        change = f'{(after - before) / before * 100:+.1f}%' if before else 'n/a'
+        return f'{before:.2f} -> {after:.2f} ({change})'
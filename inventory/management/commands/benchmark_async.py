@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from inventory.benchmarking import write_report
+from inventory.loadtest import ASYNC_SCENARIOS, BenchmarkContext, run_async_load, run_load
+
+
+class Command(BaseCommand):
+    help = 'Compare the threaded DRF read endpoints with their async counterparts under concurrent load.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', dest='scenarios', choices=sorted(ASYNC_SCENARIOS),
+                            help='Scenarios mixed by the load driver (default: all read endpoints).')
+        parser.add_argument('--requests', type=int, default=1000, help='Requests fired per path.')
+        parser.add_argument('--threads', type=int, default=8, help='Worker threads of the threaded path.')
+        parser.add_argument('--connections', type=int, default=64, help='Concurrent connections of the async path.')
+        parser.add_argument('--client-latency-ms', type=float, default=100.0,
+                            help='Simulated per-request client I/O (slow scanner connections).')
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--output', help='Write the JSON results to this file.')
+
+    def handle(self, *args, **options):
+        try:
+            ctx = BenchmarkContext(bulk_rows=0, seed=options['seed'])
+        except ValueError as e:
+            raise CommandError(f'{e} Run `manage.py seed_inventory` first.')
+
+        scenarios = options['scenarios'] or list(ASYNC_SCENARIOS)
+        latency = options['client_latency_ms'] / 1000
+        report = {
+            'meta': {
+                'started_at': timezone.now().isoformat(),
+                'vendor': connection.vendor,
+                'options': {key: options[key] for key in
+                             ('requests', 'threads', 'connections', 'client_latency_ms')},
+            },
+        }
+
+        self.stderr.write(f'Running threaded path: {options["requests"]} requests, {options["threads"]} threads')
+        report['threaded'] = run_load(scenarios, ctx, options['requests'], options['threads'], latency)
+        self.stderr.write(f'Running async path: {options["requests"]} requests, '
+                          f'{options["connections"]} connections')
+        report['async'] = run_async_load(scenarios, ctx, options['requests'], options['connections'], latency)
+
+        threaded, async_ = report['threaded'], report['async']
+        report['speedup'] = {
+            'throughput': round(async_['throughput_per_second'] / (threaded['throughput_per_second'] or 1), 2),
+            'p99': round(threaded['latency']['p99_ms'] / (async_['latency']['p99_ms'] or 1), 2),
+        }
+        write_report(self.stdout, report, options['output'])
@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from inventory.benchmarking import write_report
+from inventory.buffer import close_buffer, get_buffer
+from inventory.loadtest import BenchmarkContext, run_load
+from inventory.models import StoringInformation
+
+
+class Command(BaseCommand):
+    help = 'Additions/sec and latency of /leftover/add/ with per-request inserts and with the write-behind buffer.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000, help='Additions per mode.')
+        parser.add_argument('--workers', type=int, default=16, help='Concurrent threads of the load driver.')
+        parser.add_argument('--buffer-size', type=int, default=500)
+        parser.add_argument('--buffer-interval', type=float, default=1.0)
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--output', help='Write the JSON results to this file.')
+
+    def handle(self, *args, **options):
+        try:
+            ctx = BenchmarkContext(bulk_rows=0, seed=options['seed'])
+        except ValueError as e:
+            raise CommandError(f'{e} Run `manage.py seed_inventory` first.')
+
+        report = {
+            'meta': {
+                'started_at': timezone.now().isoformat(),
+                'vendor': connection.vendor,
+                'options': {key: options[key] for key in
+                             ('requests', 'workers', 'buffer_size', 'buffer_interval')},
+            },
+        }
+        modes = {
+            'per_request': {'INVENTORY_ADD_BUFFER': False},
+            'buffered': {'INVENTORY_ADD_BUFFER': True, 'INVENTORY_ADD_BUFFER_SIZE': options['buffer_size'],
+                         'INVENTORY_ADD_BUFFER_INTERVAL': options['buffer_interval']},
+        }
+        for mode, overrides in modes.items():
+            with override_settings(**overrides):
+                close_buffer()
+                rows = StoringInformation.objects.count()
+                self.stderr.write(f'Running {mode}: {options["requests"]} additions, {options["workers"]} workers')
+                report[mode] = run_load(['add'], ctx, options['requests'], options['workers'])
+
+                buffer = get_buffer()
+                stats = dict(buffer.stats) if buffer is not None else {}
+                drain_started = time.perf_counter()
+                close_buffer()
+                report[mode]['drain_ms'] = round((time.perf_counter() - drain_started) * 1000, 3)
+                report[mode]['flushes'] = stats.get('flushes', 0)
+                report[mode]['ledger_rows'] = StoringInformation.objects.count() - rows
+
+        per_request, buffered = report['per_request'], report['buffered']
+        report['speedup'] = {
+            'throughput': round(buffered['throughput_per_second'] / (per_request['throughput_per_second'] or 1), 2),
+            'p99': round(per_request['latency']['p99_ms'] / (buffered['latency']['p99_ms'] or 1), 2),
+        }
+        write_report(self.stdout, report, options['output'])
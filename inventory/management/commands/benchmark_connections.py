@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from inventory.benchmarking import write_report
+from inventory.loadtest import BenchmarkContext, run_load
+from inventory.pool import close_pools, get_pool
+
+POOLED_ENGINES = {
+    'postgresql': 'inventory.backends.postgresql',
+    'sqlite': 'inventory.backends.sqlite3',
+}
+STOCK_ENGINES = {
+    'postgresql': 'django.db.backends.postgresql',
+    'sqlite': 'django.db.backends.sqlite3',
+}
+PATHS = ['ping', 'retrieve']
+
+
+class Command(BaseCommand):
+    help = 'Requests/sec on /ping and /book/{id}/ with per-request, persistent and pooled database connections.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per path and mode.')
+        parser.add_argument('--workers', type=int, default=16, help='Concurrent threads of the load driver.')
+        parser.add_argument('--pool-size', type=int, default=16)
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--output', help='Write the JSON results to this file.')
+
+    def handle(self, *args, **options):
+        if connection.vendor not in POOLED_ENGINES:
+            raise CommandError(f'No pooled backend for {connection.vendor}.')
+        try:
+            ctx = BenchmarkContext(bulk_rows=0, seed=options['seed'])
+        except ValueError as e:
+            raise CommandError(f'{e} Run `manage.py seed_inventory` first.')
+
+        modes = {
+            'per_request': {'ENGINE': STOCK_ENGINES[connection.vendor], 'CONN_MAX_AGE': 0},
+            'persistent': {'ENGINE': STOCK_ENGINES[connection.vendor], 'CONN_MAX_AGE': 600},
+            'pooled': {'ENGINE': POOLED_ENGINES[connection.vendor], 'CONN_MAX_AGE': 0,
+                       'POOL': {'MAX_SIZE': options['pool_size']}},
+        }
+        report = {
+            'meta': {
+                'started_at': timezone.now().isoformat(),
+                'vendor': connection.vendor,
+                'options': {key: options[key] for key in ('requests', 'workers', 'pool_size')},
+            },
+        }
+
+        # Wrappers share this dict, so switching modes only needs fresh connections.
+        settings_dict = connections.settings[DEFAULT_DB_ALIAS]
+        original = dict(settings_dict)
+        try:
+            # Bypass the detail cache so every /book/{id}/ request queries the database.
+            with override_settings(INVENTORY_CACHE_TIMEOUT=0):
+                for mode, overrides in modes.items():
+                    connections.close_all()
+                    settings_dict.update(overrides)
+                    report[mode] = {}
+                    for path in PATHS:
+                        self.stderr.write(f'Running {mode} {path}: {options["requests"]} requests')
+                        report[mode][path] = run_load([path], ctx, options['requests'], options['workers'],
+                                                      recycle_connections=True)
+                    if mode == 'pooled':
+                        report[mode]['pool'] = dict(get_pool(DEFAULT_DB_ALIAS, settings_dict).stats)
+                    close_pools()
+        finally:
+            connections.close_all()
+            settings_dict.clear()
+            settings_dict.update(original)
+
+        report['requests_per_second'] = {
+            path: {mode: report[mode][path]['throughput_per_second'] for mode in modes} for path in PATHS
+        }
+        write_report(self.stdout, report, options['output'])
@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from inventory.benchmarking import seed_inventory, summarize, write_report
+from inventory.models import Book, StoringInformation
+
+
+class Command(BaseCommand):
+    help = 'Show query plans and latency for barcode lookups and ledger history scans.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=0, help='Seed this many books before measuring.')
+        parser.add_argument('--ledger-rows', type=int, default=0, help='Seed this many ledger rows before measuring.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=50, help='Executions per query.')
+        parser.add_argument('--output', help='Write the JSON report to this file.')
+
+    def handle(self, *args, **options):
+        if options['books']:
+            seed_inventory(
+                authors=max(1, options['books'] // 100), books=options['books'], ledger_rows=options['ledger_rows'],
+                batch_size=options['batch_size'], stdout=self.stdout,
+            )
+
+        sample = Book.objects.exclude(barcode=None).order_by('-id').values('id', 'barcode').first()
+        if sample is None:
+            self.stderr.write('No books to benchmark; pass --books to seed some.')
+            return
+
+        now = timezone.now()
+        queries = {
+            'barcode_exact': Book.objects.filter(barcode=sample['barcode']),
+            'barcode_prefix': Book.objects.filter(barcode__startswith=sample['barcode'][:6]).order_by('barcode')[:100],
+            'history_range': StoringInformation.objects.filter(
+                book_id=sample['id'], timestamp__gte=now - timezone.timedelta(days=30), timestamp__lte=now,
+            ).order_by('timestamp'),
+        }
+
+        explain_options = {'analyze': True} if connection.vendor == 'postgresql' else {}
+        report = {'vendor': connection.vendor, 'books': Book.objects.count(), 'queries': {}}
+        for name, queryset in queries.items():
+            durations = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                list(queryset.all())
+                durations.append(time.perf_counter() - started)
+            report['queries'][name] = {
+                'plan': queryset.explain(**explain_options).splitlines(),
+                'latency': summarize(durations),
+            }
+
+        write_report(self.stdout, report, options['output'])
@@ -0,0 +1,55 @@
+import gzip
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from inventory.benchmarking import summarize, write_report
+from inventory.middleware import BROTLI_QUALITY, brotli
+from inventory.models import Book, StoringInformation
+from inventory.renderers import ColumnarJSONRenderer, MessagePackRenderer, msgpack
+from inventory.serializers import BOOK_READ_FIELDS, StoringInformationSerializer, book_representation
+
+
+class Command(BaseCommand):
+    help = 'Compare response size and render/compression time of JSON, columnar JSON and MessagePack.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Rows per payload (one list page).')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--output', help='Write the JSON results to this file.')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        books = [book_representation(row) for row in Book.objects.order_by('id').values(*BOOK_READ_FIELDS)[:rows]]
+        if not books:
+            raise CommandError('No books to render. Run `manage.py seed_inventory` first.')
+        ledger = StoringInformationSerializer(StoringInformation.objects.order_by('id')[:rows], many=True).data
+
+        renderers = [JSONRenderer(), ColumnarJSONRenderer()]
+        if msgpack is not None:
+            renderers.append(MessagePackRenderer())
+        compressors = {'gzip': lambda body: gzip.compress(body, compresslevel=6)}
+        if brotli is not None:
+            compressors['br'] = lambda body: brotli.compress(body, quality=BROTLI_QUALITY)
+
+        report = {'meta': {'rows': rows, 'repeat': options['repeat']}}
+        for name, results in (('books', books), ('ledger', ledger)):
+            payload = {'next': None, 'previous': None, 'results': results}
+            report[name] = {}
+            for renderer in renderers:
+                body, render_ms = self.measure(lambda: renderer.render(payload), options['repeat'])
+                entry = {'bytes': len(body), 'render_ms': render_ms}
+                for encoding, compress in compressors.items():
+                    compressed, compress_ms = self.measure(lambda: compress(body), options['repeat'])
+                    entry[encoding] = {'bytes': len(compressed), 'compress_ms': compress_ms}
+                report[name][renderer.format] = entry
+        write_report(self.stdout, report, options['output'])
+
+    def measure(self, func, repeat):
+        durations = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func()
+            durations.append(time.perf_counter() - started)
+        return result, summarize(durations)['p50_ms']
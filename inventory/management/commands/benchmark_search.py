@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from inventory.benchmarking import seed_inventory, summarize, write_report
+from inventory.models import Book
+from inventory.search import search_books
+
+
+class Command(BaseCommand):
+    help = 'Measure book search latency for barcode, title, fuzzy title and author queries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=0, help='Seed this many books before measuring.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=20, help='Executions per query.')
+        parser.add_argument('--limit', type=int, default=20, help='Results fetched per query (one page).')
+        parser.add_argument('--output', help='Write the JSON report to this file.')
+
+    def handle(self, *args, **options):
+        if options['books']:
+            seed_inventory(
+                authors=max(1, options['books'] // 100), books=options['books'], ledger_rows=0,
+                batch_size=options['batch_size'], stdout=self.stdout,
+            )
+
+        sample = Book.objects.exclude(barcode=None).select_related('author').order_by('-id').first()
+        if sample is None:
+            self.stderr.write('No books to benchmark; pass --books to seed some.')
+            return
+
+        title_word = max(sample.title.split(), key=len)
+        queries = {
+            'barcode_prefix': sample.barcode[:7],
+            'title_substring': title_word.lower(),
+            'title_fuzzy': title_word[:-1].lower() + 'x',
+            'author_name': sample.author.name,
+        }
+
+        report = {'vendor': connection.vendor, 'books': Book.objects.count(), 'queries': {}}
+        for name, query in queries.items():
+            durations = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                results = list(search_books(query, Book.objects.db)[:options['limit']])
+                durations.append(time.perf_counter() - started)
+            report['queries'][name] = {'query': query, 'results': len(results), 'latency': summarize(durations)}
+
+        write_report(self.stdout, report, options['output'])
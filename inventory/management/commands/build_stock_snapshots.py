@@ -0,0 +1,38 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inventory.snapshots import archive_ledger, build_snapshots
+
+
+def parse_date(value):
+    return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+
+
+class Command(BaseCommand):
+    help = 'Build daily per-book stock snapshots and optionally archive old ledger rows into them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--until', type=parse_date, help='Last day to snapshot (YYYY-MM-DD, default: yesterday).')
+        parser.add_argument('--rebuild', action='store_true', help='Drop existing snapshots and start over.')
+        parser.add_argument('--archive-before', type=parse_date,
+                            help='Collapse ledger rows older than this day (YYYY-MM-DD) into one row per book and day.')
+
+    def handle(self, *args, **options):
+        until = options['until'] or timezone.localdate() - datetime.timedelta(days=1)
+        if until >= timezone.localdate():
+            # A snapshot of a day still in progress would hide its later movements.
+            raise CommandError(f'--until must be before today ({timezone.localdate()}).')
+        created = build_snapshots(until, rebuild=options['rebuild'])
+        self.stdout.write(self.style.SUCCESS(f'{created} snapshot(s) created up to {until}'))
+
+        if options['archive_before']:
+            try:
+                collapsed, deleted = archive_ledger(options['archive_before'])
+            except ValueError as e:
+                raise CommandError(str(e))
+            self.stdout.write(self.style.SUCCESS(
+                f'Archived ledger before {options["archive_before"]}: '
+                f'{deleted} row(s) folded into {collapsed} per-day row(s)'
+            ))
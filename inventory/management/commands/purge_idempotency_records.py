@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from inventory.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Delete upload hashes and Idempotency-Key results older than INVENTORY_IDEMPOTENCY_RETENTION.'
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(f'{purge_expired()} idempotency record(s) purged'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from inventory.stock import find_mismatched_balances, rebuild_balance
+
+
+class Command(BaseCommand):
+    help = 'Recompute materialized stock balances from the StoringInformation ledger.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--book', type=int, action='append', dest='books', help='Only reconcile this book id.')
+        parser.add_argument('--check', action='store_true', help='Report mismatches without fixing them.')
+
+    def handle(self, *args, **options):
+        mismatched = find_mismatched_balances(options['books'])
+
+        for book_id, (stored, expected) in sorted(mismatched.items()):
+            self.stdout.write(f'Book {book_id}: stored {stored}, ledger {expected}')
+            if not options['check']:
+                rebuild_balance(book_id)
+
+        if options['check']:
+            self.stdout.write(f'{len(mismatched)} balance(s) out of sync')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{len(mismatched)} balance(s) rebuilt'))
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.jobs import claim_next_job, retry_job, run_job
+
+
+class Command(BaseCommand):
+    help = 'Process queued bulk stock uploads.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty.')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait between queue polls.')
+        parser.add_argument('--retry', type=int, action='append', default=[], metavar='JOB',
+                            help='Requeue this failed job; it resumes after its last committed batch.')
+
+    def handle(self, *args, **options):
+        for job_id in options['retry']:
+            if not retry_job(job_id):
+                raise CommandError(f'Import {job_id} is not a failed job.')
+        while True:
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['sleep'])
+                continue
+
+            self.stdout.write(f'Processing import {job.id}')
+            job = run_job(job)
+            self.stdout.write(
+                f'Import {job.id} {job.status}: {job.imported} imported, {job.error_count} error(s), '
+                f'{job.rows_per_second} rows/s'
+            )
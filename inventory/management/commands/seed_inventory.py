@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from inventory.benchmarking import seed_inventory
+
+
+class Command(BaseCommand):
+    help = 'Generate authors, books and backdated ledger rows for benchmarking.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=100)
+        parser.add_argument('--books', type=int, default=10_000)
+        parser.add_argument('--ledger-rows', type=int, default=100_000)
+        parser.add_argument('--days', type=int, default=365, help='Spread ledger rows over this many past days.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, help='Random seed for reproducible data.')
+
+    def handle(self, *args, **options):
+        summary = seed_inventory(
+            authors=options['authors'], books=options['books'], ledger_rows=options['ledger_rows'],
+            days=options['days'], batch_size=options['batch_size'], seed=options['seed'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {summary["authors"]} authors, {summary["books"]} books and {summary["ledger_rows"]} ledger rows '
+            f'(barcode prefix {summary["barcode_prefix"]})'
+        ))
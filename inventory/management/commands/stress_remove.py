@@ -0,0 +1,77 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from inventory.benchmarking import lock_wait_timer, summarize, write_report
+from inventory.models import Author, Book, StockBalance, StoringInformation
+from inventory.stock import InsufficientStock, remove_stock
+
+
+class Command(BaseCommand):
+    help = 'Fire concurrent stock removals at one book and check that stock never goes negative.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stock', type=int, default=200, help='Initial quantity of the scratch book.')
+        parser.add_argument('--removes', type=int, default=500, help='Total number of removal attempts.')
+        parser.add_argument('--workers', type=int, default=32, help='Number of concurrent threads.')
+        parser.add_argument('--quantity', type=int, default=1, help='Quantity taken by each removal.')
+        parser.add_argument('--output', help='Write the JSON report to this file.')
+        parser.add_argument('--keep', action='store_true', help='Keep the scratch book and its ledger.')
+
+    def handle(self, *args, **options):
+        if options['quantity'] < 1:
+            raise CommandError('--quantity must be a positive integer.')
+        author = Author.objects.create(name='Stress Test', birth_date='1980-01-01')
+        book = Book.objects.create(
+            title='Stress Test', publish_year=2020, author=author, barcode=f'stress-{uuid.uuid4().hex[:12]}'
+        )
+        StoringInformation.objects.create(book=book, quantity=options['stock'])
+
+        lock = threading.Lock()
+        latencies, lock_waits, outcomes = [], [], {'removed': 0, 'rejected': 0, 'errors': 0}
+
+        def worker(_):
+            timer = lock_wait_timer(connection)
+            started = time.perf_counter()
+            try:
+                with connection.execute_wrapper(timer):
+                    remove_stock(book, options['quantity'])
+                outcome = 'removed'
+            except InsufficientStock:
+                outcome = 'rejected'
+            except Exception:
+                outcome = 'errors'
+            elapsed = time.perf_counter() - started
+            connections.close_all()
+            with lock:
+                outcomes[outcome] += 1
+                latencies.append(elapsed)
+                lock_waits.append(timer.elapsed)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            list(pool.map(worker, range(options['removes'])))
+        wall = time.perf_counter() - started
+
+        balance = StockBalance.objects.get(book=book).quantity
+        report = {
+            'vendor': connection.vendor,
+            'workers': options['workers'],
+            'attempts': options['removes'],
+            **outcomes,
+            'initial_stock': options['stock'],
+            'final_balance': balance,
+            'oversold': balance < 0,
+            'wall_seconds': round(wall, 3),
+            'throughput_per_second': round(options['removes'] / wall, 1) if wall else 0.0,
+            'latency': summarize(latencies),
+            'lock_wait': summarize(lock_waits),
+        }
+        write_report(self.stdout, report, options['output'])
+
+        if not options['keep']:
+            author.delete()
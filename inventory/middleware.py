@@ -0,0 +1,272 @@
+import contextvars
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack, nullcontext
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
+
+from .benchmarking import percentile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger('inventory.perf')
+
+# Dynamic responses: quality 11 (the default) costs far more CPU than it saves.
+BROTLI_QUALITY = 5
+
+
+class QueryTimer:
+    def __init__(self):
+        self.count = 0
+        self.elapsed = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.elapsed += time.perf_counter() - started
+            self.count += 1
+
+
+class SerializeTimer:
+    """Re-entrant timer for serializer work; nested serializers are counted once."""
+
+    def __init__(self):
+        self.elapsed = 0.0
+        self.depth = 0
+        self.started = 0.0
+
+    def __enter__(self):
+        if not self.depth:
+            self.started = time.perf_counter()
+        self.depth += 1
+
+    def __exit__(self, *exc_info):
+        self.depth -= 1
+        if not self.depth:
+            self.elapsed += time.perf_counter() - self.started
+
+
+_serialize_timer = contextvars.ContextVar('inventory_serialize_timer', default=None)
+
+
+def timed_serialization():
+    """Count the enclosed block as serialization time of the sampled request, if any."""
+    return _serialize_timer.get() or nullcontext()
+
+
+class RouteMetrics:
+    """Rolling window of the latest ``INVENTORY_PERF_WINDOW`` samples per route."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+
+    def record(self, route, sample):
+        with self.lock:
+            if route not in self.samples:
+                self.samples[route] = deque(maxlen=settings.INVENTORY_PERF_WINDOW)
+            self.samples[route].append(sample)
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+
+    def snapshot(self):
+        with self.lock:
+            samples = {route: list(values) for route, values in self.samples.items()}
+
+        stats = {}
+        for route, values in sorted(samples.items()):
+            totals = [sample['total_ms'] for sample in values]
+            db = [sample['db_ms'] for sample in values]
+            stats[route] = {
+                'count': len(values),
+                'total_ms': {f'p{pct}': round(percentile(totals, pct), 3) for pct in (50, 95, 99)},
+                'db_ms': {f'p{pct}': round(percentile(db, pct), 3) for pct in (50, 95, 99)},
+                'queries_mean': round(sum(sample['queries'] for sample in values) / len(values), 2),
+                'bytes_mean': round(sum(sample['bytes'] or 0 for sample in values) / len(values)),
+            }
+        return stats
+
+
+metrics = RouteMetrics()
+
+
+class PerformanceMiddleware:
+    """Opt-in per-request timing: wall time, SQL count and time, serializer and rendering time, response size.
+
+    Sampled requests get a ``Server-Timing`` header, a JSON log line on the
+    ``inventory.perf`` logger and a sample in the per-route rolling stats.
+    """
+
+    def __init__(self, get_response):
+        if not settings.INVENTORY_PERF_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = settings.INVENTORY_PERF_SAMPLE_RATE
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        timer = QueryTimer()
+        serialize_timer = SerializeTimer()
+        token = _serialize_timer.set(serialize_timer)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(timer))
+                response = self.get_response(request)
+        finally:
+            _serialize_timer.reset(token)
+        total = time.perf_counter() - started
+
+        render = getattr(request, '_perf_render', 0.0)
+        size = None if response.streaming else len(response.content)
+        route = request.resolver_match.view_name if request.resolver_match else 'unresolved'
+        sample = {
+            'route': route,
+            'method': request.method,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 3),
+            'db_ms': round(timer.elapsed * 1000, 3),
+            'queries': timer.count,
+            'serialize_ms': round(serialize_timer.elapsed * 1000, 3),
+            'render_ms': round(render * 1000, 3),
+            'bytes': size,
+        }
+
+        # Queries issued while serializing count towards both db and serialize.
+        app = max(total - timer.elapsed - serialize_timer.elapsed - render, 0)
+        response['Server-Timing'] = ', '.join([
+            f'total;dur={sample["total_ms"]}',
+            f'db;dur={sample["db_ms"]};desc="{timer.count} queries"',
+            f'serialize;dur={sample["serialize_ms"]}',
+            f'render;dur={sample["render_ms"]}',
+            f'app;dur={round(app * 1000, 3)}',
+        ])
+        logger.info(json.dumps(sample))
+        if route != 'perf-metrics':
+            metrics.record(route, sample)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered right after this hook; time the renderer.
+        started = time.perf_counter()
+
+        def rendered(response):
+            request._perf_render = time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+def accepted_encodings(header):
+    encodings = set()
+    for part in header.split(','):
+        name, *params = part.split(';')
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            encodings.add(name.strip().lower())
+    return encodings
+
+
+def brotli_sequence(sequence):
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    for chunk in sequence:
+        data = compressor.process(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware:
+    """Brotli (when installed and accepted) or gzip for responses of at least ``INVENTORY_COMPRESSION_MIN_SIZE`` bytes.
+
+    Streaming exports are compressed chunk by chunk. Like Django's
+    ``GZipMiddleware``, strong ETags are weakened since the bytes change, and
+    gzip output gets up to ``max_random_bytes`` of random header padding to
+    mitigate BREACH. Runs natively under ASGI, so async views stay async.
+    """
+
+    sync_capable = True
+    async_capable = True
+    max_random_bytes = 100
+
+    def __init__(self, get_response):
+        if not settings.INVENTORY_COMPRESSION_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def compress(self, request, response):
+        if response.has_header('Content-Encoding') or response.status_code == 304:
+            return response
+        if response.streaming and response.is_async:
+            return response
+        if not response.streaming and len(response.content) < settings.INVENTORY_COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and 'br' in accepted:
+            encoding = 'br'
+        elif 'gzip' in accepted:
+            encoding = 'gzip'
+        else:
+            return response
+
+        if response.streaming:
+            content = response.streaming_content
+            response.streaming_content = (
+                brotli_sequence(content) if encoding == 'br'
+                else compress_sequence(content, max_random_bytes=self.max_random_bytes)
+            )
+            del response['Content-Length']
+        else:
+            if encoding == 'br':
+                compressed = brotli.compress(response.content, quality=BROTLI_QUALITY)
+            else:
+                compressed = compress_string(response.content, max_random_bytes=self.max_random_bytes)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
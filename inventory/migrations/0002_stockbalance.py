@@ -0,0 +1,21 @@
+# Generated by Django 5.0.1 on 2026-10-18 20:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockBalance',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stock', serialize=False, to='inventory.book')),
+                ('quantity', models.IntegerField(default=0)),
+            ],
+        ),
+    ]
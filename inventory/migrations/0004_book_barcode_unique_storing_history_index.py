@@ -0,0 +1,36 @@
+# Generated by Django 5.0.1 on 2026-10-18 20:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def blank_barcodes_to_null(apps, schema_editor):
+    # Several books could share '' before barcodes were unique; store them as
+    # NULL like Book.save() does so the constraint can be added.
+    Book = apps.get_model('inventory', 'Book')
+    Book.objects.filter(barcode='').update(barcode=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_importjob'),
+    ]
+
+    operations = [
+        migrations.RunPython(blank_barcodes_to_null, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='book',
+            name='barcode',
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='storinginformation',
+            name='book',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='inventory.book'),
+        ),
+        migrations.AddIndex(
+            model_name='storinginformation',
+            index=models.Index(fields=['book', 'timestamp'], name='storing_book_timestamp_idx'),
+        ),
+    ]
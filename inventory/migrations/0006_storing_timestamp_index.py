@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-18 20:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_stocksnapshot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='storinginformation',
+            index=models.Index(fields=['timestamp'], name='storing_timestamp_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+from django.db import migrations
+from django.db.models import Sum
+
+BATCH_SIZE = 1000
+
+
+def backfill_stock_balances(apps, schema_editor):
+    """Materialize balances for ledgers written before StockBalance existed."""
+    StockBalance = apps.get_model('inventory', 'StockBalance')
+    StoringInformation = apps.get_model('inventory', 'StoringInformation')
+
+    totals = dict(
+        StoringInformation.objects.values('book_id').annotate(total=Sum('quantity')).order_by()
+        .values_list('book_id', 'total')
+    )
+    balances = {balance.book_id: balance for balance in StockBalance.objects.all()}
+
+    missing = [StockBalance(book_id=book_id, quantity=total) for book_id, total in totals.items()
+               if book_id not in balances]
+    StockBalance.objects.bulk_create(missing, batch_size=BATCH_SIZE)
+
+    stale = []
+    for book_id, balance in balances.items():
+        total = totals.get(book_id) or 0
+        if balance.quantity != total:
+            balance.quantity = total
+            balance.version += 1
+            stale.append(balance)
+    StockBalance.objects.bulk_update(stale, ['quantity', 'version'], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_idempotencyrecord'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_stock_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+# icontains compiles to UPPER(column::text) LIKE UPPER(...) on PostgreSQL;
+# only an index on that exact expression can serve it.
+UPPER_TRIGRAM_INDEXES = [
+    ('inventory_book_title_upper_trgm', 'inventory_book', 'title'),
+    ('inventory_author_name_upper_trgm', 'inventory_author', 'name'),
+]
+
+
+def create_upper_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in UPPER_TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ((UPPER({column}::text)) gin_trgm_ops)'
+        )
+
+
+def drop_upper_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in UPPER_TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0011_importjob_heartbeat'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_upper_trigram_indexes, drop_upper_trigram_indexes),
+    ]
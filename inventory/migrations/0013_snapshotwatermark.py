@@ -0,0 +1,38 @@
+# Generated by Django 5.0.1 on 2026-10-18 21:10
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def seed_watermark(apps, schema_editor):
+    """Snapshots built before the watermark existed reach at least their latest day."""
+    SnapshotWatermark = apps.get_model("inventory", "SnapshotWatermark")
+    StockSnapshot = apps.get_model("inventory", "StockSnapshot")
+    last = StockSnapshot.objects.aggregate(last=Max("date"))["last"]
+    if last is not None:
+        SnapshotWatermark.objects.create(date=last)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("inventory", "0012_search_upper_trigram_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SnapshotWatermark",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+            ],
+        ),
+        migrations.RunPython(seed_watermark, migrations.RunPython.noop),
+    ]
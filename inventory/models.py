@@ -1,28 +1,204 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from .cache import invalidate_books_on_commit
 
 
 class Author(models.Model):
     name = models.CharField(max_length=100)
     birth_date = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
 
 
 class Book(models.Model):
-    barcode = models.CharField(max_length=100, blank=True, null=True)
+    # On PostgreSQL Django backs a unique CharField with a second
+    # varchar_pattern_ops index, which serves `barcode__startswith` searches.
+    barcode = models.CharField(max_length=100, blank=True, null=True, unique=True)
     title = models.CharField(max_length=100)
     publish_year = models.IntegerField()
     author = models.ForeignKey(Author, on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # Books without a barcode are stored as NULL so they never collide
+        # on the unique constraint.
+        if not self.barcode:
+            self.barcode = None
+        super().save(*args, **kwargs)
+
+
+class StoringInformationQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        deltas = {}
+        for obj in objs:
+            book_id = obj.book_id if obj.book_id is not None else obj.book.pk
+            deltas[book_id] = deltas.get(book_id, 0) + obj.quantity
+
+        with transaction.atomic(using=self.db):
+            created = super().bulk_create(objs, *args, **kwargs)
+            StockBalance.objects.apply_deltas(deltas)
+        return created
+
 
 class StoringInformation(models.Model):
-    book = models.ForeignKey(Book, on_delete=models.CASCADE)
+    # Indexed through the (book, timestamp) index below.
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, db_index=False)
     quantity = models.IntegerField()
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    objects = StoringInformationQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['book', 'timestamp'], name='storing_book_timestamp_idx'),
+            models.Index(fields=['timestamp'], name='storing_timestamp_idx'),
+        ]
+
     def __str__(self):
         return self.book.title + " " + str(self.quantity)
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                StockBalance.objects.apply_deltas({self.book_id: self.quantity})
+
+
+class StockBalanceManager(models.Manager):
+    UPDATE_BATCH_SIZE = 200
+
+    def apply_deltas(self, deltas):
+        deltas = {book_id: delta for book_id, delta in deltas.items() if delta}
+        if not deltas:
+            return
+
+        # Lock existing rows in a stable order so concurrent writers touching
+        # several books cannot deadlock each other.
+        existing = set(
+            self.select_for_update().filter(book_id__in=deltas).order_by('book_id').values_list('book_id', flat=True)
+        )
+        missing = [self.model(book_id=book_id, quantity=0) for book_id in sorted(deltas) if book_id not in existing]
+        if missing:
+            self.bulk_create(missing, ignore_conflicts=True)
+
+        if len(deltas) == 1:
+            [(book_id, delta)] = deltas.items()
+            self.filter(book_id=book_id).update(
+                quantity=F('quantity') + delta, version=F('version') + 1, updated_at=Now(),
+            )
+            invalidate_books_on_commit(deltas)
+            return
+
+        items = sorted(deltas.items())
+        for start in range(0, len(items), self.UPDATE_BATCH_SIZE):
+            batch = items[start:start + self.UPDATE_BATCH_SIZE]
+            increment = Case(
+                *[When(book_id=book_id, then=Value(delta)) for book_id, delta in batch],
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+            self.filter(book_id__in=[book_id for book_id, _ in batch]).update(
+                quantity=F('quantity') + increment, version=F('version') + 1, updated_at=Now(),
+            )
+        invalidate_books_on_commit(deltas)
+
+
+class StockBalance(models.Model):
+    book = models.OneToOneField(Book, on_delete=models.CASCADE, primary_key=True, related_name='stock')
+    quantity = models.IntegerField(default=0)
+    # Bumped on every change; part of the book's ETag.
+    version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = StockBalanceManager()
+
+    def __str__(self):
+        return self.book.title + " " + str(self.quantity)
+
+
+class StockSnapshot(models.Model):
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='snapshots', db_index=False)
+    date = models.DateField()
+    # Exclusive upper bound of the ledger rows folded into ``quantity``: the
+    # start of the day after ``date``.
+    until = models.DateTimeField()
+    quantity = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'date'], name='stock_snapshot_book_date_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.book_id} {self.date}: {self.quantity}'
+
+
+class SnapshotWatermark(models.Model):
+    # Single row: snapshots are complete for every day up to ``date``, moved or not.
+    date = models.DateField()
+
+    def __str__(self):
+        return str(self.date)
+
+
+class ImportJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    file = models.FileField(upload_to='imports/')
+    file_format = models.CharField(max_length=10)
+    rows_processed = models.IntegerField(default=0)
+    imported = models.IntegerField(default=0)
+    error_count = models.IntegerField(default=0)
+    errors = models.JSONField(default=list)
+    message = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    # Refreshed with every committed batch; a running job whose heartbeat is
+    # older than INVENTORY_IMPORT_JOB_TIMEOUT is reclaimed by another worker.
+    heartbeat_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f'Import {self.pk} ({self.status})'
+
+    @property
+    def rows_per_second(self):
+        if self.started_at is None:
+            return 0.0
+        elapsed = ((self.finished_at or timezone.now()) - self.started_at).total_seconds()
+        return round(self.rows_processed / elapsed, 1) if elapsed > 0 else 0.0
+
+
+class IdempotencyRecord(models.Model):
+    """The stored outcome of a write that carried an idempotency key or uploaded a known file."""
+
+    key = models.CharField(max_length=255, unique=True)
+    # Hash of the request payload; a reused key with a different payload is rejected.
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True)
+    job = models.ForeignKey(ImportJob, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return self.key
@@ -0,0 +1,90 @@
+from django.db import connections
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(CursorPagination):
+    """Cursor pagination with an opt-in (and, where possible, estimated) total count."""
+
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    ordering = 'id'
+    count_query_param = 'count'
+    count_by_default = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        self.count_estimated = False
+        if self.count_requested(request):
+            self.count, self.count_estimated = self.get_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def count_requested(self, request):
+        value = request.query_params.get(self.count_query_param)
+        if value is None:
+            return self.count_by_default
+        return value.lower() in ('1', 'true', 'yes')
+
+    def get_count(self, queryset):
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            # Unfiltered tables: the planner statistics are close enough and
+            # avoid a sequential scan for COUNT(*).
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                               [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] >= 0:
+                return row[0], True
+        return queryset.count(), False
+
+    def get_paginated_response(self, data):
+        payload = {'next': self.get_next_link(), 'previous': self.get_previous_link(), 'results': data}
+        if self.count is not None:
+            payload['count'] = self.count
+            payload['count_estimated'] = self.count_estimated
+        return Response(payload)
+
+
+class BarcodePagination(KeysetPagination):
+    ordering = 'barcode'
+    count_by_default = True
+
+
+class ReportPagination(LimitOffsetPagination):
+    default_limit = 100
+    max_limit = 1000
+
+
+class RankedPagination(LimitOffsetPagination):
+    """Offset pagination for ranked results; looks one row ahead instead of counting."""
+
+    default_limit = 20
+    max_limit = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.offset = self.get_offset(request)
+        rows = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(rows) > self.limit
+        return rows[:self.limit]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = replace_query_param(self.request.build_absolute_uri(), self.limit_query_param, self.limit)
+        return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
+
+    def get_previous_link(self):
+        if self.offset <= 0:
+            return None
+        url = replace_query_param(self.request.build_absolute_uri(), self.limit_query_param, self.limit)
+        if self.offset - self.limit <= 0:
+            return remove_query_param(url, self.offset_query_param)
+        return replace_query_param(url, self.offset_query_param, self.offset - self.limit)
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'previous': self.get_previous_link(), 'results': data})
@@ -0,0 +1,55 @@
+import codecs
+
+import openpyxl
+
+
+def iter_excel_rows(uploaded_file):
+    workbook = openpyxl.load_workbook(uploaded_file, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        for row_number, row in enumerate(sheet.iter_rows(min_row=1, max_col=2, values_only=True), start=1):
+            barcode, quantity = (tuple(row) + (None, None))[:2]
+            if barcode is not None:
+                barcode = str(barcode).strip()
+
+            if not barcode:
+                continue
+
+            yield row_number, barcode, quantity
+    finally:
+        workbook.close()
+
+
+def iter_lines(uploaded_file, encoding='utf-8'):
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ''
+
+    for chunk in uploaded_file.chunks():
+        lines = (pending + decoder.decode(chunk)).splitlines(keepends=True)
+        # The last piece may be an unfinished line (or a '\r' whose '\n' is
+        # still in the next chunk), so it waits for more data.
+        pending = lines.pop() if lines else ''
+        for line in lines:
+            yield line
+
+    yield from (pending + decoder.decode(b'', final=True)).splitlines()
+
+
+def iter_txt_rows(uploaded_file):
+    current_barcode = None
+
+    for line_number, line in enumerate(iter_lines(uploaded_file), start=1):
+        line = line.strip()
+
+        if line.startswith("BRC"):
+            current_barcode = line[3:]
+        elif line.startswith("QNT"):
+            yield line_number, current_barcode, line[3:]
+            current_barcode = None
+
+
+PARSERS = {
+    'xls': iter_excel_rows,
+    'xlsx': iter_excel_rows,
+    'txt': iter_txt_rows,
+}
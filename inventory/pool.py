@@ -0,0 +1,180 @@
+import threading
+import time
+from collections import Counter, deque
+
+_lock = threading.Lock()
+_pools = {}
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Thread-safe pool of DB-API connections for one database alias.
+
+    Idle connections are reused most-recently-returned first; closed ones and
+    those older than ``max_lifetime`` seconds are replaced on checkout, and
+    those idle for ``check_after`` seconds must answer a ``SELECT 1`` first,
+    so a connection the server dropped is not handed to a request.
+    """
+
+    def __init__(self, max_size=20, timeout=30.0, max_lifetime=1800.0, check_after=30.0):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.check_after = check_after
+        self.condition = threading.Condition()
+        self.idle = deque()
+        self.created_at = {}
+        self.returned_at = {}
+        self.stats = Counter()
+
+    @property
+    def size(self):
+        return len(self.created_at)
+
+    def acquire(self, connect):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self.condition:
+                connection, slot = self.checkout(deadline)
+            if slot is not None:
+                break
+            # The liveness check runs outside the lock; it is a server round trip.
+            if self.alive(connection):
+                with self.condition:
+                    self.stats['reused'] += 1
+                return connection
+            self.discard(connection)
+
+        try:
+            connection = connect()
+        except Exception:
+            with self.condition:
+                del self.created_at[slot]
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.created_at[id(connection)] = self.created_at.pop(slot)
+            self.stats['created'] += 1
+        return connection
+
+    def checkout(self, deadline):
+        """Return ``(idle connection, None)`` or ``(None, reserved slot)``; call with the lock held."""
+        while True:
+            while self.idle:
+                connection = self.idle.pop()
+                if self.usable(connection):
+                    return connection, None
+                self.close(connection)
+            if self.size < self.max_size:
+                # Reserve the slot; the connection is opened outside the lock.
+                slot = object()
+                self.created_at[slot] = time.monotonic()
+                return None, slot
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self.condition.wait(remaining):
+                self.stats['timeouts'] += 1
+                raise PoolTimeout(f'No connection available within {self.timeout}s ({self.max_size} in use).')
+
+    def alive(self, connection):
+        with self.condition:
+            idle_for = time.monotonic() - self.returned_at.pop(id(connection), time.monotonic())
+        if idle_for < self.check_after:
+            return True
+        try:
+            cursor = connection.cursor()
+            try:
+                cursor.execute('SELECT 1')
+            finally:
+                cursor.close()
+            connection.rollback()
+        except Exception:
+            with self.condition:
+                self.stats['dead'] += 1
+            return False
+        return True
+
+    def release(self, connection):
+        with self.condition:
+            if id(connection) not in self.created_at:
+                return
+            if self.usable(connection):
+                self.returned_at[id(connection)] = time.monotonic()
+                self.idle.append(connection)
+            else:
+                self.close(connection)
+            self.condition.notify()
+
+    def discard(self, connection):
+        with self.condition:
+            self.close(connection)
+            self.condition.notify()
+
+    def usable(self, connection):
+        if getattr(connection, 'closed', False):
+            return False
+        return time.monotonic() - self.created_at[id(connection)] < self.max_lifetime
+
+    def close(self, connection):
+        self.created_at.pop(id(connection), None)
+        self.returned_at.pop(id(connection), None)
+        self.stats['closed'] += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def close_idle(self):
+        with self.condition:
+            while self.idle:
+                self.close(self.idle.pop())
+
+
+def get_pool(alias, settings_dict):
+    with _lock:
+        if alias not in _pools:
+            options = settings_dict.get('POOL') or {}
+            _pools[alias] = ConnectionPool(
+                max_size=options.get('MAX_SIZE', 20),
+                timeout=options.get('TIMEOUT', 30.0),
+                max_lifetime=options.get('MAX_LIFETIME', 1800.0),
+                check_after=options.get('CHECK_AFTER', 30.0),
+            )
+        return _pools[alias]
+
+
+def close_pools():
+    with _lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close_idle()
+
+
+class PooledDatabaseWrapperMixin:
+    """Check connections out of a per-process pool instead of opening one per request.
+
+    ``close()`` (end of request with ``CONN_MAX_AGE=0``, or an unusable
+    connection) hands the connection back to the pool after rolling back
+    anything left open.
+    """
+
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict)
+
+    def get_new_connection(self, conn_params):
+        connect = super().get_new_connection
+        return self.pool.acquire(lambda: connect(conn_params))
+
+    def _close(self):
+        if self.connection is None:
+            return
+        try:
+            self.connection.rollback()
+        except self.Database.Error:
+            self.pool.discard(self.connection)
+        else:
+            self.pool.release(self.connection)
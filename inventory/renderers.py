@@ -0,0 +1,77 @@
+import datetime
+import decimal
+import uuid
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.settings import api_settings
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Keys holding the row list in our paginated and search payloads.
+ROW_KEYS = ('results', 'items')
+
+
+def flatten(row, prefix=''):
+    flat = {}
+    for key, value in row.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f'{prefix}{key}.'))
+        else:
+            flat[f'{prefix}{key}'] = value
+    return flat
+
+
+def to_columns(rows):
+    """``[{'id': 1, 'author': {'name': 'A'}}, ...]`` -> ``{'id': [1, ...], 'author.name': ['A', ...]}``."""
+    flat = [flatten(row) for row in rows]
+    keys = dict.fromkeys(key for row in flat for key in row)
+    return {key: [row.get(key) for row in flat] for key in keys}
+
+
+def columnar(data):
+    if isinstance(data, list) and all(isinstance(row, dict) for row in data):
+        return to_columns(data)
+    if isinstance(data, dict):
+        return {key: to_columns(value) if key in ROW_KEYS and isinstance(value, list) else value
+                for key, value in data.items()}
+    return data
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    """JSON with one array per field instead of one object per row; nested fields are dotted."""
+
+    media_type = 'application/vnd.inventory.columnar+json'
+    format = 'columnar'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(columnar(data), accepted_media_type, renderer_context)
+
+
+def msgpack_default(value):
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    raise TypeError(f'Cannot serialize {type(value).__name__} to MessagePack')
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=msgpack_default)
+
+
+# JSON stays the default; the others are picked through the Accept header
+# (or ?format=columnar / ?format=msgpack).
+BULK_RENDERER_CLASSES = [*api_settings.DEFAULT_RENDERER_CLASSES, ColumnarJSONRenderer]
+if msgpack is not None:
+    BULK_RENDERER_CLASSES.append(MessagePackRenderer)
@@ -0,0 +1,37 @@
+import datetime
+
+from django.db.models import DateField, Q, Sum
+from django.db.models.functions import Coalesce, Trunc
+
+from .models import Book, StoringInformation
+from .snapshots import annotate_balance_as_of, day_start
+
+PERIODS = ('day', 'week', 'month')
+GROUPS = {
+    'author': ('book__author_id', 'book__author__name'),
+    'publish_year': ('book__publish_year',),
+}
+
+
+def stock_report(as_of):
+    """Every book with its closing stock at the end of day ``as_of``."""
+    moment = day_start(as_of + datetime.timedelta(days=1))
+    return annotate_balance_as_of(Book.objects.all(), moment).values('id', 'barcode', 'title', 'balance')
+
+
+def movement_report(group, period, start=None, end=None):
+    """Inflow, outflow and net movement per ``group`` and ``period`` between two days (inclusive)."""
+    queryset = StoringInformation.objects.all()
+    if start:
+        queryset = queryset.filter(timestamp__gte=day_start(start))
+    if end:
+        queryset = queryset.filter(timestamp__lt=day_start(end + datetime.timedelta(days=1)))
+
+    group_fields = GROUPS[group]
+    return queryset.annotate(
+        period=Trunc('timestamp', period, output_field=DateField()),
+    ).values('period', *group_fields).annotate(
+        inflow=Coalesce(Sum('quantity', filter=Q(quantity__gt=0)), 0),
+        outflow=Coalesce(-Sum('quantity', filter=Q(quantity__lt=0)), 0),
+        net=Sum('quantity'),
+    ).order_by('period', *group_fields)
@@ -0,0 +1,75 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'inventory_pin'
+
+_replica_reads = ContextVar('inventory_replica_reads', default=False)
+
+
+def replica_aliases():
+    return settings.INVENTORY_READ_REPLICAS
+
+
+def reading_from_replica():
+    return bool(replica_aliases()) and _replica_reads.get()
+
+
+@contextmanager
+def replica_reads():
+    """Let reads inside the block go to a replica."""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    """Send reads flagged by ``replica_reads`` to a random replica, everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        # Reads inside a transaction must see its own writes.
+        if not reading_from_replica() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return random.choice(replica_aliases())
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema through replication.
+        if db in replica_aliases():
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """Run ``replica_actions`` against a replica unless the client recently wrote.
+
+    Successful writes set a short-lived pin cookie so the same client reads
+    from the primary until the replicas have caught up.
+    """
+
+    replica_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in self.replica_actions and PIN_COOKIE not in request.COOKIES:
+            self._replica_token = _replica_reads.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _replica_reads.reset(token)
+            self._replica_token = None
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400 and replica_aliases():
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.INVENTORY_REPLICA_PIN_SECONDS, httponly=True)
+        return response
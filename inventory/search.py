@@ -0,0 +1,120 @@
+import re
+
+from django.db import connections
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.functions import Greatest
+
+from .models import Book
+from .serializers import BOOK_READ_FIELDS
+
+# pg_trgm's default ``similarity_threshold``.
+SIMILARITY_THRESHOLD = 0.3
+AUTHOR_WEIGHT = 0.8
+# Upper bound on rows the non-PostgreSQL fallback ranks in Python.
+FALLBACK_CANDIDATE_LIMIT = 5000
+
+WORD_RE = re.compile(r'\w+')
+
+
+def trigrams(text):
+    """Trigram set computed the way pg_trgm does: per lowercased word, padded with blanks."""
+    grams = set()
+    for word in WORD_RE.findall(text.lower()):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(left, right):
+    left, right = trigrams(left), trigrams(right)
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+def search_books(query, using):
+    """Books matching ``query`` by barcode prefix, title or author name, best match first.
+
+    Returns ``BOOK_READ_FIELDS`` rows with an extra ``rank``, read from the ``using`` database.
+    """
+    if connections[using].vendor == 'postgresql':
+        return search_postgresql(query).using(using)
+    return search_fallback(query, using)
+
+
+def direct_rank(query):
+    """Rank part earned by barcode and substring matches."""
+    return Case(
+        When(barcode=query, then=Value(3.0)),
+        When(barcode__startswith=query, then=Value(2.0)),
+        default=Value(0.0),
+        output_field=FloatField(),
+    ) + Case(
+        When(title__icontains=query, then=Value(1.0)),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+def search_postgresql(query):
+    from django.contrib.postgres.search import TrigramSimilarity
+
+    rank = direct_rank(query) + Greatest(
+        TrigramSimilarity('title', query),
+        TrigramSimilarity('author__name', query) * AUTHOR_WEIGHT,
+    )
+    # One branch per table so each can combine its own indexes (barcode
+    # pattern index, trigram indexes on the column and on UPPER(column) for
+    # icontains); OR-ing across the join would scan every book.
+    by_book = Book.objects.filter(
+        Q(barcode__startswith=query) | Q(title__icontains=query) | Q(title__trigram_similar=query)
+    ).values('id')
+    by_author = Book.objects.filter(
+        Q(author__name__icontains=query) | Q(author__name__trigram_similar=query)
+    ).values('id')
+    return (
+        Book.objects.filter(id__in=by_book.union(by_author)).annotate(rank=rank)
+        .order_by('-rank', 'id').values(*BOOK_READ_FIELDS, 'rank')
+    )
+
+
+def search_fallback(query, using):
+    lowered = query.lower()
+    books = Book.objects.using(using).values(*BOOK_READ_FIELDS)
+    direct = Q(barcode__startswith=query) | Q(title__icontains=query) | Q(author__name__icontains=query)
+    # Barcode and substring matches come first, best first, so the candidate
+    # limit can only cut off the weakest of them; fuzzy candidates fill the rest.
+    candidates = list(
+        books.filter(direct).annotate(direct_rank=direct_rank(query))
+        .order_by('-direct_rank', 'id')[:FALLBACK_CANDIDATE_LIMIT]
+    )
+    remaining = FALLBACK_CANDIDATE_LIMIT - len(candidates)
+    if remaining > 0:
+        # Any shared inner trigram makes a title a fuzzy candidate; ranking below
+        # applies the same similarity threshold as pg_trgm.
+        fuzzy = Q()
+        for word in WORD_RE.findall(lowered):
+            for i in range(len(word) - 2):
+                fuzzy |= Q(title__icontains=word[i:i + 3])
+        if fuzzy:
+            candidates += books.filter(fuzzy).exclude(direct).order_by('id')[:remaining]
+
+    ranked = []
+    for row in candidates:
+        row.pop('direct_rank', None)
+        barcode = row['barcode'] or ''
+        title_similarity = similarity(row['title'], query)
+        author_similarity = similarity(row['author__name'], query) * AUTHOR_WEIGHT
+        substring = lowered in row['title'].lower()
+        if not (barcode.startswith(query) or substring or lowered in row['author__name'].lower()
+                or max(title_similarity, author_similarity / AUTHOR_WEIGHT) >= SIMILARITY_THRESHOLD):
+            continue
+        row['rank'] = (
+            (3.0 if barcode == query else 2.0 if barcode.startswith(query) else 0.0)
+            + (1.0 if substring else 0.0)
+            + max(title_similarity, author_similarity)
+        )
+        ranked.append(row)
+
+    ranked.sort(key=lambda row: (-row['rank'], row['id']))
+    return ranked
@@ -5,7 +5,8 @@ from rest_framework.exceptions import ValidationError
 from rest_framework.fields import DateField, IntegerField, DateTimeField
 from rest_framework.relations import PrimaryKeyRelatedField
 
-from inventory.models import Author, Book, StoringInformation
+from inventory.middleware import timed_serialization
+from inventory.models import Author, Book, ImportJob, StoringInformation
 
 
 def validate_birth_date(value):
@@ -13,7 +14,15 @@ def validate_birth_date(value):
         raise ValidationError('Birth date must be greater than 1900.')
 
 
-class AuthorSerializer(serializers.ModelSerializer):
+class TimedRepresentationMixin:
+    """Report ``to_representation`` as serialization time under ``PerformanceMiddleware``."""
+
+    def to_representation(self, instance):
+        with timed_serialization():
+            return super().to_representation(instance)
+
+
+class AuthorSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     birth_date = DateField(write_only=True, format='%Y-%m-%d', validators=[validate_birth_date])
 
     class Meta:
@@ -27,7 +36,7 @@ class AuthorBirthDateSerializer(serializers.ModelSerializer):
         fields = ["name", 'birth_date']
 
 
-class BookSerializer(serializers.ModelSerializer):
+class BookSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     publish_year = IntegerField(min_value=1900)
     author = AuthorBirthDateSerializer(read_only=True)
     author_id = PrimaryKeyRelatedField(queryset=Author.objects.all(), write_only=True, source='author')
@@ -37,16 +46,65 @@ class BookSerializer(serializers.ModelSerializer):
         fields = ['id', 'barcode', 'title', 'publish_year', 'author', 'author_id']
 
 
-class BookStoringSerializer(serializers.ModelSerializer):
+BOOK_READ_FIELDS = ('id', 'barcode', 'title', 'publish_year', 'author__name', 'author__birth_date')
+
+
+def book_representation(row):
+    """Build the ``BookSerializer`` output from a ``.values(*BOOK_READ_FIELDS)`` row."""
+    return {
+        'id': row['id'],
+        'barcode': row['barcode'],
+        'title': row['title'],
+        'publish_year': row['publish_year'],
+        'author': {
+            'name': row['author__name'],
+            'birth_date': row['author__birth_date'].isoformat(),
+        },
+    }
+
+
+class BookStoringSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     class Meta:
         model = Book
         fields = ['id', 'barcode', 'title']
 
 
-class StoringInformationSerializer(serializers.ModelSerializer):
+class StoringInformationSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     timestamp = DateTimeField(format='%Y-%m-%d', read_only=True)
     book = PrimaryKeyRelatedField(queryset=Book.objects.all(), write_only=True)
 
     class Meta:
         model = StoringInformation
         fields = ['quantity', 'timestamp', 'book']
+
+
+class ImportJobSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
+    rows_per_second = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = ImportJob
+        fields = ['id', 'status', 'rows_processed', 'rows_per_second', 'imported', 'error_count', 'errors',
+                  'message', 'created_at', 'started_at', 'finished_at']
+
+
+class MovementSerializer(serializers.Serializer):
+    barcode = serializers.CharField(max_length=100)
+    delta = IntegerField()
+
+    def validate_delta(self, value):
+        if value == 0:
+            raise ValidationError('Delta must not be zero.')
+        return value
+
+
+class RemovalSerializer(serializers.Serializer):
+    barcode = serializers.CharField(max_length=100)
+    quantity = IntegerField(min_value=1)
+
+
+class MovementBatchSerializer(serializers.Serializer):
+    ATOMIC = 'atomic'
+    BEST_EFFORT = 'best_effort'
+
+    movements = serializers.ListField(child=MovementSerializer(), min_length=1, max_length=5000)
+    mode = serializers.ChoiceField(choices=[ATOMIC, BEST_EFFORT], default=ATOMIC)
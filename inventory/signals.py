@@ -0,0 +1,15 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_books_on_commit
+from .models import Author, Book
+
+
+@receiver([post_save, post_delete], sender=Book)
+def invalidate_book(sender, instance, **kwargs):
+    invalidate_books_on_commit([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Author)
+def invalidate_author_books(sender, instance, **kwargs):
+    invalidate_books_on_commit(Book.objects.filter(author_id=instance.pk).values_list('id', flat=True))
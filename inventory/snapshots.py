@@ -0,0 +1,129 @@
+import datetime
+from itertools import groupby, islice
+
+from django.db import transaction
+from django.db.models import Count, DateTimeField, Min, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import Book, SnapshotWatermark, StockSnapshot, StoringInformation
+
+SNAPSHOT_BATCH_SIZE = 1000
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def annotate_balance_as_of(books, moment):
+    """Annotate ``Book`` rows with ``balance``: their stock just before ``moment``.
+
+    The balance starts from the latest snapshot that closed before ``moment``
+    and adds only the ledger rows written after it.
+    """
+    day = timezone.localdate(moment)
+    snapshot = StockSnapshot.objects.filter(book_id=OuterRef('id'), date__lt=day).order_by('-date')
+    snapshot_until = StockSnapshot.objects.filter(book_id=OuterRef(OuterRef('id')), date__lt=day).order_by('-date')
+    tail = StoringInformation.objects.filter(
+        book_id=OuterRef('id'),
+        timestamp__lt=moment,
+        timestamp__gte=Coalesce(
+            Subquery(snapshot_until.values('until')[:1]), Value(EPOCH, output_field=DateTimeField())
+        ),
+    ).order_by().values('book_id').annotate(total=Sum('quantity')).values('total')
+    return books.annotate(
+        balance=Coalesce(Subquery(snapshot.values('quantity')[:1]), 0) + Coalesce(Subquery(tail), 0),
+    )
+
+
+def balance_as_of(book_id, moment):
+    if moment is None:
+        return 0
+    return annotate_balance_as_of(Book.objects.filter(id=book_id), moment).values_list('balance', flat=True).first() or 0
+
+
+def built_until():
+    """Last day the snapshots are complete for, or None before the first build."""
+    return SnapshotWatermark.objects.values_list('date', flat=True).first()
+
+
+def build_snapshots(until, rebuild=False):
+    """Store a closing balance per book for every day up to ``until`` on which it moved.
+
+    Runs incrementally from the last built day unless ``rebuild`` is set.
+    """
+    with transaction.atomic():
+        if rebuild:
+            StockSnapshot.objects.all().delete()
+            SnapshotWatermark.objects.all().delete()
+        watermark = SnapshotWatermark.objects.select_for_update().values_list('date', flat=True).first()
+        if watermark is not None and watermark >= until:
+            return 0
+
+        daily = StoringInformation.objects.filter(timestamp__lt=day_start(until + datetime.timedelta(days=1)))
+        if watermark is not None:
+            daily = daily.filter(timestamp__gte=day_start(watermark + datetime.timedelta(days=1)))
+        daily = daily.annotate(day=TruncDate('timestamp')).values('book_id', 'day').annotate(
+            net=Sum('quantity')
+        ).order_by('book_id', 'day').values_list('book_id', 'day', 'net')
+
+        created = 0
+        books = groupby(daily.iterator(chunk_size=SNAPSHOT_BATCH_SIZE), key=lambda row: row[0])
+        while batch := list(islice(((book_id, list(rows)) for book_id, rows in books), SNAPSHOT_BATCH_SIZE)):
+            openings = latest_snapshot_quantities([book_id for book_id, _ in batch])
+            snapshots = []
+            for book_id, rows in batch:
+                balance = openings.get(book_id, 0)
+                for _, day, net in rows:
+                    balance += net
+                    snapshots.append(StockSnapshot(
+                        book_id=book_id, date=day, until=day_start(day + datetime.timedelta(days=1)), quantity=balance,
+                    ))
+            StockSnapshot.objects.bulk_create(snapshots)
+            created += len(snapshots)
+        SnapshotWatermark.objects.update_or_create(id=1, defaults={'date': until})
+    return created
+
+
+def latest_snapshot_quantities(book_ids):
+    latest = StockSnapshot.objects.filter(book_id=OuterRef('book_id')).order_by('-date').values('date')[:1]
+    return dict(
+        StockSnapshot.objects.filter(book_id__in=book_ids, date=Subquery(latest)).values_list('book_id', 'quantity')
+    )
+
+
+def archive_ledger(before):
+    """Collapse ledger rows older than ``before`` into one row per book and day.
+
+    Each day's rows become a single row with their net quantity at the day's
+    earliest moment, so daily balances, snapshots (including a rebuild) and
+    history at day granularity stay exact; only the per-movement detail
+    within those days is dropped.
+    """
+    watermark = built_until()
+    if watermark is None or watermark < before - datetime.timedelta(days=1):
+        raise ValueError('Build snapshots up to the archive date before archiving the ledger.')
+
+    archived = StoringInformation.objects.filter(timestamp__lt=day_start(before))
+    collapsed = deleted = 0
+    with transaction.atomic():
+        days = archived.annotate(day=TruncDate('timestamp')).values('book_id', 'day').annotate(
+            keep_id=Min('id'), first=Min('timestamp'), total=Sum('quantity'), rows=Count('id'),
+        ).order_by('book_id', 'day').values_list('book_id', 'keep_id', 'first', 'total', 'rows')
+
+        books = groupby(days.iterator(chunk_size=SNAPSHOT_BATCH_SIZE), key=lambda row: row[0])
+        while batch := list(islice(((book_id, list(rows)) for book_id, rows in books), SNAPSHOT_BATCH_SIZE)):
+            kept = [row for _, rows in batch for row in rows]
+            # bulk_update bypasses save(), so the stock balances stay untouched:
+            # the rows are rewritten, not new movements.
+            StoringInformation.objects.bulk_update(
+                [StoringInformation(id=keep_id, timestamp=first, quantity=total)
+                 for _, keep_id, first, total, rows in kept if rows > 1],
+                ['timestamp', 'quantity'],
+            )
+            deleted += archived.filter(book_id__in=[book_id for book_id, _ in batch]).exclude(
+                id__in=[row[1] for row in kept]
+            ).delete()[0]
+            collapsed += sum(row[4] > 1 for row in kept)
+    return collapsed, deleted
@@ -0,0 +1,125 @@
+from django.db import transaction
+from django.db.models import Sum
+
+from .buffer import buffered_delta
+from .cache import acached, cached, fill_timeout, get_cache, invalidate_books_on_commit, make_entry, stock_key
+from .models import Book, StockBalance, StoringInformation
+
+
+class InsufficientStock(Exception):
+    pass
+
+
+def get_balance(book_id):
+    return cached('stock', stock_key(book_id), lambda: (
+        StockBalance.objects.filter(book_id=book_id).values_list('quantity', flat=True).first() or 0
+    ), book_id=book_id) + buffered_delta(book_id)
+
+
+def prime_balance(book_id, quantity, generation):
+    """Seed the ``get_balance`` cache with a balance read alongside other data.
+
+    ``generation`` is the book's cache generation from before that read.
+    """
+    get_cache().add(stock_key(book_id), make_entry(quantity, generation), fill_timeout(None))
+
+
+async def aget_balance(book_id):
+    async def compute():
+        return await StockBalance.objects.filter(book_id=book_id).values_list('quantity', flat=True).afirst() or 0
+
+    return await acached('stock', stock_key(book_id), compute, book_id=book_id) + buffered_delta(book_id)
+
+
+def remove_stock(book, quantity):
+    if quantity <= 0:
+        raise ValueError('Quantity to remove must be a positive integer.')
+
+    with transaction.atomic():
+        # Write first: the ledger insert takes the balance row lock, so
+        # concurrent removals for the same book are serialized and the check
+        # below sees every committed movement before ours.
+        StoringInformation.objects.create(book=book, quantity=-quantity)
+        balance = StockBalance.objects.select_for_update().filter(book=book).values_list(
+            'quantity', flat=True
+        ).first() or 0
+        if balance < 0:
+            raise InsufficientStock(f'Only {balance + quantity} item(s) of {book.barcode} in stock')
+    return balance
+
+
+def apply_movements(movements, atomic=True):
+    """Apply ``{'barcode', 'delta'}`` movements in one transaction.
+
+    Removals are checked against balances locked in book id order, so
+    concurrent batches touching the same books cannot deadlock or oversell.
+    With ``atomic`` any failed item rolls back the whole batch; otherwise
+    valid items are applied and failures are reported alongside them.
+    """
+    barcodes = {movement['barcode'] for movement in movements}
+    book_ids = dict(Book.objects.filter(barcode__in=barcodes).values_list('barcode', 'id'))
+
+    with transaction.atomic():
+        balances = dict(
+            StockBalance.objects.select_for_update().filter(book_id__in=book_ids.values())
+            .order_by('book_id').values_list('book_id', 'quantity')
+        )
+
+        results, entries = [], []
+        for movement in movements:
+            barcode, delta = movement['barcode'], movement['delta']
+            result = {'barcode': barcode, 'delta': delta}
+            book_id = book_ids.get(barcode)
+            if book_id is None:
+                result.update(status='error', error='Unknown barcode')
+            elif balances.get(book_id, 0) + delta < 0:
+                result.update(status='error', error='quantity is not enough', balance=balances.get(book_id, 0))
+            else:
+                balances[book_id] = balances.get(book_id, 0) + delta
+                result.update(status='applied', balance=balances[book_id])
+                entries.append(StoringInformation(book_id=book_id, quantity=delta))
+            results.append(result)
+
+        failed = len(results) - len(entries)
+        if atomic and failed:
+            for result in results:
+                if result['status'] == 'applied':
+                    result['status'] = 'skipped'
+                    del result['balance']
+            return results, False
+
+        StoringInformation.objects.bulk_create(entries)
+    return results, True
+
+
+def find_mismatched_balances(book_ids=None):
+    ledger = StoringInformation.objects.values('book_id').annotate(total=Sum('quantity')).order_by()
+    balances = StockBalance.objects.all()
+    if book_ids:
+        ledger = ledger.filter(book_id__in=book_ids)
+        balances = balances.filter(book_id__in=book_ids)
+
+    totals = {row['book_id']: row['total'] for row in ledger.iterator()}
+    mismatched = {}
+    for book_id, quantity in balances.values_list('book_id', 'quantity').iterator():
+        total = totals.pop(book_id, 0)
+        if total != quantity:
+            mismatched[book_id] = (quantity, total)
+    for book_id, total in totals.items():
+        if total:
+            mismatched[book_id] = (0, total)
+    return mismatched
+
+
+def rebuild_balance(book_id):
+    with transaction.atomic():
+        # Hold the balance row while summing so ledger writers queue behind us
+        # instead of applying their delta to a value we are about to overwrite.
+        balance, _ = StockBalance.objects.select_for_update().get_or_create(book_id=book_id)
+        total = StoringInformation.objects.filter(book_id=book_id).aggregate(total=Sum('quantity'))['total'] or 0
+        if balance.quantity != total:
+            balance.quantity = total
+            balance.version += 1
+            balance.save(update_fields=['quantity', 'version', 'updated_at'])
+            invalidate_books_on_commit([book_id])
+        return total
@@ -1,15 +1,53 @@
+import csv
+import datetime
+import gzip
+import json
 import os
-from django.test import TestCase
+import sqlite3
+import tempfile
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test import skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
-from .models import Author, Book, StoringInformation
+from .backends.sqlite3.base import DatabaseWrapper as PooledSQLiteWrapper
+from .benchmarking import ROW_LOCK_STATEMENTS, lock_wait_timer
+from .buffer import StockBuffer, close_buffer, get_buffer
+from .cache import cached, invalidate_books, stock_key
+from .checks import add_buffer_check, shared_cache_check
+from .imports import import_batch, import_rows
+from .jobs import claim_next_job, enqueue_import, run_job
+from .loadtest import SCENARIOS, BenchmarkContext, run_scenario
+from .middleware import CompressionMiddleware, SerializeTimer, brotli, metrics
+from .models import Author, Book, IdempotencyRecord, ImportJob, StockBalance, StockSnapshot, StoringInformation
+from .parsers import iter_excel_rows, iter_lines
+from .pool import ConnectionPool, PoolTimeout, close_pools
+from .renderers import ColumnarJSONRenderer, msgpack
+from .routing import PIN_COOKIE, ReplicaRouter, replica_reads
+from .search import similarity
+from .snapshots import balance_as_of, build_snapshots, built_until
+from .stock import InsufficientStock, find_mismatched_balances, get_balance, remove_stock
 
 
 class InventoryAPITest(TestCase):
 
     def setUp(self):
         self.client = APIClient()
+        cache.clear()
 
         self.author = Author.objects.create(name='Test Author', birth_date='1980-01-01')
         self.book = Book.objects.create(title='Test Book', publish_year=2020, author=self.author, barcode='12345')
@@ -19,7 +57,7 @@ class InventoryAPITest(TestCase):
         url = reverse('book-list')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
 
     def test_get_book_detail(self):
         url = reverse('book-detail', args=[self.book.id])
@@ -53,6 +91,20 @@ class InventoryAPITest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(Book.objects.count(), 1)
 
+    def test_create_books_without_barcode(self):
+        url = reverse('book-list')
+        for title in ('First', 'Second'):
+            data = {'title': title, 'publish_year': 2021, 'author_id': self.author.id, 'barcode': ''}
+            response = self.client.post(url, data)
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Book.objects.filter(barcode=None).count(), 2)
+
+    def test_create_book_duplicate_barcode(self):
+        url = reverse('book-list')
+        data = {'title': 'New Book', 'publish_year': 2021, 'author_id': self.author.id, 'barcode': self.book.barcode}
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_create_author(self):
         author_data = {'name': 'John Doe', 'birth_date': '1980-01-01'}
         url = reverse('author-list')
@@ -64,8 +116,8 @@ class InventoryAPITest(TestCase):
         url = reverse('author-list')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['name'], 'Test Author')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['name'], 'Test Author')
 
     def test_get_author_detail(self):
         url = reverse('author-detail', args=[self.author.id])
@@ -77,6 +129,31 @@ class InventoryAPITest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data, res)
 
+    def test_search_book_by_barcode(self):
+        Book.objects.create(title='Another Book', publish_year=2021, author=self.author, barcode='123456')
+        Book.objects.create(title='Unrelated Book', publish_year=2021, author=self.author, barcode='99999')
+        url = reverse('book-list') + '?barcode=123&page_size=1'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['found'], 2)
+        self.assertEqual([item['barcode'] for item in response.data['items']], ['12345'])
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual([item['barcode'] for item in response.data['items']], ['123456'])
+        self.assertIsNone(response.data['next'])
+
+    def test_get_book_list_pages(self):
+        for i in range(3):
+            Book.objects.create(title=f'Book {i}', publish_year=2021, author=self.author, barcode=f'b{i}')
+        url = reverse('book-list') + '?page_size=2&count=true'
+        response = self.client.get(url)
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual(len(response.data['results']), 2)
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNone(response.data['next'])
+
     def test_add_quantity(self):
         url = reverse('storinginformation-add')
         data = {'barcode': self.book.barcode, 'quantity': 5}
@@ -107,3 +184,1212 @@ class InventoryAPITest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(StoringInformation.objects.count(), 3)
         self.assertEqual(StoringInformation.objects.last().quantity, -2)
+
+
+class StockBalanceTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+        self.author = Author.objects.create(name='Test Author', birth_date='1980-01-01')
+        self.book = Book.objects.create(title='Test Book', publish_year=2020, author=self.author, barcode='12345')
+        StoringInformation.objects.create(book=self.book, quantity=10)
+
+    def test_balance_follows_ledger(self):
+        self.client.post(reverse('storinginformation-add'), {'barcode': self.book.barcode, 'quantity': 5})
+        self.client.post(reverse('storinginformation-remove'), {'barcode': self.book.barcode, 'quantity': 7})
+        self.assertEqual(StockBalance.objects.get(book=self.book).quantity, 8)
+
+    def test_bulk_create_updates_balance(self):
+        other = Book.objects.create(title='Other Book', publish_year=2021, author=self.author, barcode='67890')
+        StoringInformation.objects.bulk_create([
+            StoringInformation(book=self.book, quantity=2),
+            StoringInformation(book=other, quantity=4),
+            StoringInformation(book=other, quantity=-1),
+        ])
+        self.assertEqual(StockBalance.objects.get(book=self.book).quantity, 12)
+        self.assertEqual(StockBalance.objects.get(book=other).quantity, 3)
+
+    def test_ledger_rows_are_append_only(self):
+        entry = StoringInformation.objects.get(book=self.book)
+        url = reverse('storinginformation-detail', args=[entry.id])
+        self.assertEqual(self.client.patch(url, {'quantity': 50}).status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+        self.client.post(reverse('storinginformation-list'), {'book': self.book.id, 'quantity': 3})
+        self.assertEqual(StockBalance.objects.get(book=self.book).quantity, 13)
+
+    def test_remove_requires_positive_quantity(self):
+        empty = Book.objects.create(title='Empty Book', publish_year=2021, author=self.author, barcode='67890')
+        url = reverse('storinginformation-remove')
+        for barcode, quantity in [('67890', 0), ('12345', -3), ('12345', 'many'), ('12345', 1.5), ('12345', None)]:
+            response = self.client.post(url, {'barcode': barcode, 'quantity': quantity}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('quantity', response.data)
+        self.assertEqual(StockBalance.objects.get(book=self.book).quantity, 10)
+        self.assertFalse(StoringInformation.objects.filter(book=empty).exists())
+        with self.assertRaises(ValueError):
+            remove_stock(empty, 0)
+
+    def test_lock_wait_timer_times_blocking_statements(self):
+        timer = lock_wait_timer(connection)
+        with connection.execute_wrapper(timer):
+            remove_stock(self.book, 1)
+        # The two balance row locks, or SQLite's two writes.
+        self.assertEqual(timer.count, 2)
+        self.assertTrue(ROW_LOCK_STATEMENTS.search('SELECT "quantity" FROM "inventory_stockbalance" FOR UPDATE'))
+        self.assertFalse(ROW_LOCK_STATEMENTS.search('UPDATE "inventory_stockbalance" SET "quantity" = 1'))
+
+    def test_rebuild_command(self):
+        StockBalance.objects.filter(book=self.book).update(quantity=99)
+        out = StringIO()
+        call_command('rebuild_stock_balances', stdout=out)
+        self.assertIn('1 balance(s) rebuilt', out.getvalue())
+        self.assertEqual(StockBalance.objects.get(book=self.book).quantity, 10)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentRemoveTest(TransactionTestCase):
+
+    def test_concurrent_removes_never_oversell(self):
+        author = Author.objects.create(name='Test Author', birth_date='1980-01-01')
+        book = Book.objects.create(title='Test Book', publish_year=2020, author=author, barcode='12345')
+        StoringInformation.objects.create(book=book, quantity=20)
+
+        def attempt(_):
+            try:
+                remove_stock(book, 1)
+                return True
+            except InsufficientStock:
+                return False
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            results = list(pool.map(attempt, range(50)))
+
+        self.assertEqual(results.count(True), 20)
+        self.assertEqual(StockBalance.objects.get(book=book).quantity, 0)
+        self.assertEqual(StoringInformation.objects.filter(book=book).count(), 21)
+
+
+class BulkImportTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+        self.author = Author.objects.create(name='Test Author', birth_date='1980-01-01')
+        self.book = Book.objects.create(title='Test Book', publish_year=2020, author=self.author, barcode='12345')
+
+    def test_bulk_txt_reports_row_errors(self):
+        content = b'BRC12345\nQNT4\nBRC00000\nQNT2\nBRC12345\nQNTabc\nBRC12345\nQNT-1\n'
+        uploaded = SimpleUploadedFile('stock.txt', content)
+        response = self.client.post(reverse('storinginformation-bulk'), {'file': uploaded}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['imported'], 2)
+        self.assertEqual(
+            [(error['row'], error['barcode']) for error in response.data['errors']],
+            [(4, '00000'), (6, '12345')],
+        )
+        self.assertEqual(StockBalance.objects.get(book=self.book).quantity, 3)
+
+    def test_import_rows_resolves_barcodes_per_batch(self):
+        rows = [(n, '12345', 1) for n in range(10)]
+        with CaptureQueriesContext(connection) as context:
+            result = import_rows(rows, chunk_size=5)
+        book_lookups = [q for q in context.captured_queries if 'FROM "inventory_book"' in q['sql']]
+        ledger_inserts = [q for q in context.captured_queries if q['sql'].startswith('INSERT INTO "inventory_storinginformation"')]
+        self.assertEqual(len(book_lookups), 2)
+        self.assertEqual(len(ledger_inserts), 2)
+        self.assertEqual(result.imported, 10)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class IdempotencyTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+        self.author = Author.objects.create(name='Test Author', birth_date='1980-01-01')
+        self.book = Book.objects.create(title='Test Book', publish_year=2020, author=self.author, barcode='12345')
+        StoringInformation.objects.create(book=self.book, quantity=5)
+
+    def upload(self, content=b'BRC12345\nQNT4\n', query='', **headers):
+        uploaded = SimpleUploadedFile('stock.txt', content)
+        return self.client.post(reverse('storinginformation-bulk') + query, {'file': uploaded},
+                                format='multipart', headers=headers)
+
+    def test_repeated_bulk_upload_replays_first_result(self):
+        first = self.upload()
+        with CaptureQueriesContext(connection) as context:
+            second = self.upload()
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertFalse(any('inventory_storinginformation' in q['sql'] for q in context.captured_queries))
+        self.assertEqual(StockBalance.objects.get(book=self.book).quantity, 9)
+
+        self.upload(b'BRC12345\nQNT1\n')
+        self.assertEqual(StockBalance.objects.get(book=self.book).quantity, 10)
+
+    def test_dedupe_can_be_disabled(self):
+        self.upload(query='?dedupe=false')
+        self.upload(query='?dedupe=false')
+        self.assertEqual(StockBalance.objects.get(book=self.book).quantity, 13)
+        self.assertFalse(IdempotencyRecord.objects.exists())
+
+    def test_repeated_async_upload_returns_same_job(self):
+        first = self.upload(query='?async=true')
+        second = self.upload(query='?async=true')
+        self.assertEqual(second.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(second.data['job'], first.data['job'])
+        self.assertEqual(ImportJob.objects.count(), 1)
+
+        call_command('run_import_worker', once=True, stdout=StringIO())
+        self.assertEqual(self.upload(query='?async=true').data['status'], ImportJob.DONE)
+
+    def test_repeated_upload_retries_failed_job(self):
+        job_id = self.upload(query='?async=true').data['job']
+        with mock.patch('inventory.jobs.import_rows', side_effect=RuntimeError('disk full')), \
+                self.assertLogs('inventory.jobs'):
+            call_command('run_import_worker', once=True, stdout=StringIO())
+        self.assertEqual(ImportJob.objects.get(id=job_id).status, ImportJob.FAILED)
+
+        response = self.upload(query='?async=true')
+        self.assertEqual(response.data, {'job': job_id, 'status': ImportJob.PENDING})
+        call_command('run_import_worker', once=True, stdout=StringIO())
+        self.assertEqual(ImportJob.objects.get(id=job_id).status, ImportJob.DONE)
+        self.assertEqual(StockBalance.objects.get(book=self.book).quantity, 9)
+
+    def test_upload_key_reused_with_other_file(self):
+        self.assertEqual(self.upload(**{'Idempotency-Key': 'k'}).status_code, status.HTTP_200_OK)
+        response = self.upload(b'BRC12345\nQNT5\n', **{'Idempotency-Key': 'k'})
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(StockBalance.objects.get(book=self.book).quantity, 9)
+
+    def test_failed_upload_is_not_recorded(self):
+        with mock.patch('inventory.views.import_rows', side_effect=ValueError('broken file')):
+            self.assertEqual(self.upload().status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(IdempotencyRecord.objects.exists())
+        self.assertEqual(self.upload().status_code, status.HTTP_200_OK)
+        self.assertEqual(StockBalance.objects.get(book=self.book).quantity, 9)
+
+    def test_movement_idempotency_key(self):
+        url = reverse('storinginformation-add')
+        headers = {'Idempotency-Key': 'scan-1'}
+        self.client.post(url, {'barcode': '12345', 'quantity': 2}, format='json', headers=headers)
+        response = self.client.post(url, {'barcode': '12345', 'quantity': 2}, format='json', headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response['Idempotent-Replayed'], 'true')
+        self.assertEqual(StockBalance.objects.get(book=self.book).quantity, 7)
+
+        response = self.client.post(url, {'barcode': '12345', 'quantity': 3}, format='json', headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+        # Keys are scoped per action.
+        self.client.post(reverse('storinginformation-remove'), {'barcode': '12345', 'quantity': 2},
+                         format='json', headers=headers)
+        self.assertEqual(StockBalance.objects.get(book=self.book).quantity, 5)
+
+    def test_failed_remove_can_be_retried(self):
+        url = reverse('storinginformation-remove')
+        headers = {'Idempotency-Key': 'scan-2'}
+        response = self.client.post(url, {'barcode': '12345', 'quantity': 50}, format='json', headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(IdempotencyRecord.objects.exists())
+
+        StoringInformation.objects.create(book=self.book, quantity=50)
+        response = self.client.post(url, {'barcode': '12345', 'quantity': 50}, format='json', headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    @override_settings(INVENTORY_IDEMPOTENCY_RETENTION=0)
+    def test_expired_records_are_reprocessed_and_purged(self):
+        self.upload()
+        self.upload()
+        self.assertEqual(StockBalance.objects.get(book=self.book).quantity, 13)
+
+        out = StringIO()
+        call_command('purge_idempotency_records', stdout=out)
+        self.assertIn('1 idempotency record(s) purged', out.getvalue())
+        self.assertFalse(IdempotencyRecord.objects.exists())
+
+
+class ParserTest(TestCase):
+
+    def test_iter_lines_across_chunk_boundaries(self):
+        class ChunkedFile:
+            def chunks(self):
+                yield from [b'BRC1\r', b'\nQNT\xc3', b'\xa92\nBRC', b'2\nQNT5']
+
+        self.assertEqual(list(iter_lines(ChunkedFile())), ['BRC1\r\n', 'QNTé2\n', 'BRC2\n', 'QNT5'])
+
+    def test_iter_excel_rows_streams_rows(self):
+        path_to_file = os.path.join(os.path.dirname(__file__), 'test_data.xlsx')
+        with open(path_to_file, 'rb') as file:
+            rows = iter_excel_rows(file)
+            self.assertIsInstance(rows, Iterator)
+            self.assertEqual([barcode for _, barcode, _ in rows], ['12345', '12345'])
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ImportJobTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+        self.author = Author.objects.create(name='Test Author', birth_date='1980-01-01')
+        self.book = Book.objects.create(title='Test Book', publish_year=2020, author=self.author, barcode='12345')
+
+    def test_async_bulk_upload(self):
+        uploaded = SimpleUploadedFile('stock.txt', b'BRC12345\nQNT4\nBRC00000\nQNT2\n')
+        url = reverse('storinginformation-bulk') + '?async=true'
+        response = self.client.post(url, {'file': uploaded}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(StoringInformation.objects.count(), 0)
+
+        job_url = reverse('importjob-detail', args=[response.data['job']])
+        self.assertEqual(self.client.get(job_url).data['status'], ImportJob.PENDING)
+
+        call_command('run_import_worker', once=True, stdout=StringIO())
+
+        response = self.client.get(job_url)
+        self.assertEqual(response.data['status'], ImportJob.DONE)
+        self.assertEqual(response.data['rows_processed'], 2)
+        self.assertEqual(response.data['imported'], 1)
+        self.assertEqual(response.data['error_count'], 1)
+        self.assertEqual(StockBalance.objects.get(book=self.book).quantity, 4)
+
+    @override_settings(INVENTORY_BULK_CHUNK_SIZE=1)
+    def test_failed_job_resumes_after_committed_batches(self):
+        job = enqueue_import(SimpleUploadedFile('stock.txt', b'BRC12345\nQNT1\nBRC12345\nQNT2\nBRC12345\nQNT4\n'), 'txt')
+        real_import_batch = import_batch
+        calls = []
+
+        def flaky_import_batch(batch, result):
+            calls.append(batch)
+            if len(calls) == 2:
+                raise RuntimeError('database went away')
+            real_import_batch(batch, result)
+
+        with mock.patch('inventory.imports.import_batch', flaky_import_batch), self.assertLogs('inventory.jobs'):
+            call_command('run_import_worker', once=True, stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.FAILED)
+        self.assertEqual(job.rows_processed, 1)
+        self.assertEqual(StockBalance.objects.get(book=self.book).quantity, 1)
+
+        call_command('run_import_worker', once=True, retry=[job.id], stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.DONE)
+        self.assertEqual((job.rows_processed, job.imported), (3, 3))
+        self.assertEqual(StockBalance.objects.get(book=self.book).quantity, 7)
+
+    def test_abandoned_job_is_reclaimed(self):
+        job = enqueue_import(SimpleUploadedFile('stock.txt', b'BRC12345\nQNT4\n'), 'txt')
+        self.assertEqual(claim_next_job().id, job.id)
+        self.assertIsNone(claim_next_job())
+
+        ImportJob.objects.filter(id=job.id).update(heartbeat_at=timezone.now() - datetime.timedelta(hours=1))
+        with self.assertLogs('inventory.jobs', 'WARNING'):
+            reclaimed = claim_next_job()
+        self.assertEqual(reclaimed.id, job.id)
+
+        # The first worker no longer owns the job and must not import anything.
+        job.refresh_from_db()
+        job.heartbeat_at -= datetime.timedelta(seconds=1)
+        with self.assertLogs('inventory.jobs', 'WARNING'):
+            self.assertEqual(run_job(job).status, ImportJob.RUNNING)
+        self.assertEqual(StoringInformation.objects.count(), 0)
+
+        self.assertEqual(run_job(reclaimed).status, ImportJob.DONE)
+        self.assertEqual(StockBalance.objects.get(book=self.book).quantity, 4)
+
+
+class HistoryTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+        self.author = Author.objects.create(name='Test Author', birth_date='1980-01-01')
+        self.book = Book.objects.create(title='Test Book', publish_year=2020, author=self.author, barcode='12345')
+        for day, quantity in [(1, 10), (5, -3), (10, 4), (15, -2), (20, 7)]:
+            entry = StoringInformation.objects.create(book=self.book, quantity=quantity)
+            StoringInformation.objects.filter(id=entry.id).update(
+                timestamp=datetime.datetime(2024, 1, day, 12, tzinfo=datetime.timezone.utc)
+            )
+
+    def history(self, start, end):
+        url = reverse('storinginformation-history') + f'?book={self.book.id}&start={start}&end={end}'
+        return self.client.get(url)
+
+    def test_history_balances(self):
+        response = self.history('2024-01-03', '2024-01-16')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['start_balance'], 10)
+        self.assertEqual(response.data['end_balance'], 9)
+        self.assertEqual(
+            [(row['timestamp'], row['quantity'], row['balance']) for row in response.data['history']],
+            [('2024-01-05', -3, 7), ('2024-01-10', 4, 11), ('2024-01-15', -2, 9)],
+        )
+
+    def test_history_empty_window(self):
+        response = self.history('2024-02-01', '2024-03-01')
+        self.assertEqual(response.data['start_balance'], 16)
+        self.assertEqual(response.data['end_balance'], 16)
+        self.assertEqual(response.data['history'], [])
+
+    def test_history_query_count_is_constant(self):
+        with self.assertNumQueries(3):
+            self.history('2024-01-01', '2024-01-02')
+        with self.assertNumQueries(3):
+            self.history('2024-01-01', '2024-12-31')
+
+
+class ExportTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+        self.author = Author.objects.create(name='Test Author', birth_date='1980-01-01')
+        self.book = Book.objects.create(title='Test Book', publish_year=2020, author=self.author, barcode='12345')
+        Book.objects.create(title='Empty Book', publish_year=2021, author=self.author, barcode='67890')
+        StoringInformation.objects.create(book=self.book, quantity=10)
+        StoringInformation.objects.create(book=self.book, quantity=-4)
+
+    def test_export_books_ndjson(self):
+        response = self.client.get(reverse('book-export'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([(row['barcode'], row['quantity']) for row in rows], [('12345', 6), ('67890', 0)])
+        self.assertEqual(rows[0]['author_name'], 'Test Author')
+
+    def test_export_ledger_csv(self):
+        response = self.client.get(reverse('storinginformation-export') + f'?output=csv&book={self.book.id}')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0], ['id', 'book_id', 'barcode', 'quantity', 'timestamp'])
+        self.assertEqual([row[3] for row in rows[1:]], ['10', '-4'])
+
+    def test_export_unknown_format(self):
+        response = self.client.get(reverse('book-export') + '?output=xml')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RendererTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+        self.author = Author.objects.create(name='Test Author', birth_date='1980-01-01')
+        for barcode in ('12345', '67890'):
+            book = Book.objects.create(title=f'Book {barcode}', publish_year=2020, author=self.author, barcode=barcode)
+            StoringInformation.objects.create(book=book, quantity=3)
+
+    def test_columnar_list(self):
+        response = self.client.get(reverse('book-list'), HTTP_ACCEPT=ColumnarJSONRenderer.media_type)
+        self.assertEqual(response['Content-Type'], ColumnarJSONRenderer.media_type)
+        results = json.loads(response.content)['results']
+        self.assertEqual(results['barcode'], ['12345', '67890'])
+        self.assertEqual(results['author.name'], ['Test Author', 'Test Author'])
+
+        plain = self.client.get(reverse('book-list'))
+        self.assertNotEqual(response['ETag'], plain['ETag'])
+
+    @skipUnless(msgpack, 'msgpack is not installed')
+    def test_msgpack_list_and_export(self):
+        url = reverse('storinginformation-list')
+        response = self.client.get(url, HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), json.loads(self.client.get(url).content))
+
+        response = self.client.get(reverse('book-export'), HTTP_ACCEPT='application/msgpack')
+        unpacker = msgpack.Unpacker()
+        unpacker.feed(b''.join(response.streaming_content))
+        fields, *rows = list(unpacker)
+        self.assertEqual(fields[:2], ['id', 'barcode'])
+        self.assertEqual([row[1] for row in rows], ['12345', '67890'])
+
+    def test_columnar_export(self):
+        response = self.client.get(reverse('storinginformation-export') + '?output=columnar')
+        [chunk] = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(chunk['quantity'], [3, 3])
+
+    @override_settings(INVENTORY_COMPRESSION_MIN_SIZE=0)
+    def test_compression(self):
+        url = reverse('book-list')
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(response['ETag'].startswith('W/'))
+        self.assertEqual(json.loads(gzip.decompress(response.content)), json.loads(self.client.get(url).content))
+
+        response = self.client.get(reverse('book-export'), HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertNotIn('Content-Encoding', response)
+
+        if brotli is not None:
+            response = self.client.get(reverse('book-export'), HTTP_ACCEPT_ENCODING='gzip, br')
+            self.assertEqual(response['Content-Encoding'], 'br')
+            lines = brotli.decompress(b''.join(response.streaming_content)).splitlines()
+            self.assertEqual(len(lines), 2)
+
+    @override_settings(INVENTORY_COMPRESSION_MIN_SIZE=0)
+    def test_compression_runs_async(self):
+        async def view(request):
+            return HttpResponse(b'x' * 2000)
+
+        middleware = CompressionMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        bodies = {async_to_sync(middleware)(request).content for _ in range(5)}
+        self.assertEqual({gzip.decompress(body) for body in bodies}, {b'x' * 2000})
+        # Random gzip header padding (BREACH mitigation) varies the bytes.
+        self.assertGreater(len(bodies), 1)
+
+
+class BookReadQueryTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+        for i in range(5):
+            author = Author.objects.create(name=f'Author {i}', birth_date='1980-01-01')
+            Book.objects.create(title=f'Book {i}', publish_year=2020, author=author, barcode=f'100{i}')
+
+    def assert_list_queries(self):
+        for url in (reverse('book-list'), reverse('book-list') + '?barcode=100&count=false'):
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_lean_list_queries(self):
+        response = self.assert_list_queries()
+        self.assertEqual(response.data['items'][0], {
+            'id': Book.objects.get(barcode='1000').id,
+            'barcode': '1000',
+            'title': 'Book 0',
+            'publish_year': 2020,
+            'author': {'name': 'Author 0', 'birth_date': '1980-01-01'},
+        })
+
+    @override_settings(INVENTORY_LEAN_READS=False)
+    def test_serializer_list_queries(self):
+        serialized = self.client.get(reverse('book-list')).data['results']
+        self.assert_list_queries()
+        with self.settings(INVENTORY_LEAN_READS=True):
+            self.assertEqual(self.client.get(reverse('book-list')).data['results'], serialized)
+
+
+class BookCacheTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+
+        self.author = Author.objects.create(name='Test Author', birth_date='1980-01-01')
+        self.book = Book.objects.create(title='Test Book', publish_year=2020, author=self.author, barcode='12345')
+        StoringInformation.objects.create(book=self.book, quantity=10)
+        self.url = reverse('book-detail', args=[self.book.id])
+
+    def test_detail_served_from_cache(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['quantity'], 10)
+
+    def test_stock_movement_invalidates(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('storinginformation-add'), {'barcode': self.book.barcode, 'quantity': 5})
+        self.assertEqual(self.client.get(self.url).data['quantity'], 15)
+
+    def test_author_update_invalidates(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse('author-detail', args=[self.author.id]), {'name': 'Renamed'})
+        self.assertEqual(self.client.get(self.url).data['author']['name'], 'Renamed')
+
+    def test_read_racing_a_write_cannot_store_stale_balance(self):
+        def read_before_commit():
+            balance = StockBalance.objects.get(book=self.book).quantity
+            # The write commits and invalidates while this read is in flight.
+            StockBalance.objects.filter(book=self.book).update(quantity=15)
+            invalidate_books([self.book.id])
+            return balance
+
+        self.assertEqual(cached('stock', stock_key(self.book.id), read_before_commit, book_id=self.book.id), 10)
+        self.assertEqual(get_balance(self.book.id), 15)
+
+    @override_settings(WEB_CONCURRENCY=4)
+    def test_local_cache_with_several_workers_warns(self):
+        self.assertEqual([warning.id for warning in shared_cache_check(None)], ['inventory.W001'])
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}):
+            self.assertEqual(shared_cache_check(None), [])
+
+    def test_cache_stats(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+        stats = self.client.get(reverse('cache-stats')).data
+        self.assertGreaterEqual(stats['book']['hits'], 1)
+        self.assertGreaterEqual(stats['book']['misses'], 1)
+
+
+class ConditionalGetTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+
+        self.author = Author.objects.create(name='Test Author', birth_date='1980-01-01')
+        self.book = Book.objects.create(title='Test Book', publish_year=2020, author=self.author, barcode='12345')
+        StoringInformation.objects.create(book=self.book, quantity=10)
+        self.url = reverse('book-detail', args=[self.book.id])
+
+    def test_detail_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_changes_with_stock_and_author(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('storinginformation-add'), {'barcode': self.book.barcode, 'quantity': 5})
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['quantity'], 15)
+        self.assertNotEqual(response['ETag'], etag)
+
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.name = 'Renamed'
+            self.author.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.data['author']['name'], 'Renamed')
+
+    def test_list_not_modified(self):
+        url = reverse('book-list')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Book.objects.create(title='Second Book', publish_year=2021, author=self.author, barcode='12399')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(len(response.data['results']), 2)
+
+        found = self.client.get(url, {'barcode': '123'})
+        response = self.client.get(url, {'barcode': '123'}, HTTP_IF_NONE_MATCH=found['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_author_endpoints(self):
+        detail = reverse('author-detail', args=[self.author.id])
+        response = self.client.get(detail, HTTP_IF_NONE_MATCH=self.client.get(detail)['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        url = reverse('author-list')
+        etag = self.client.get(url)['ETag']
+        self.author.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+
+class MovementBatchTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+        self.author = Author.objects.create(name='Test Author', birth_date='1980-01-01')
+        self.book = Book.objects.create(title='Test Book', publish_year=2020, author=self.author, barcode='12345')
+        self.other = Book.objects.create(title='Other Book', publish_year=2020, author=self.author, barcode='67890')
+        StoringInformation.objects.create(book=self.book, quantity=5)
+        self.url = reverse('storinginformation-batch')
+
+    def post(self, movements, mode='atomic'):
+        return self.client.post(self.url, {'movements': movements, 'mode': mode}, format='json')
+
+    def test_atomic_batch_applies_all(self):
+        response = self.post([
+            {'barcode': '12345', 'delta': -5},
+            {'barcode': '67890', 'delta': 3},
+            {'barcode': '67890', 'delta': -2},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([result['balance'] for result in response.data['results']], [0, 3, 1])
+        self.assertEqual(StockBalance.objects.get(book=self.book).quantity, 0)
+        self.assertEqual(StockBalance.objects.get(book=self.other).quantity, 1)
+
+    def test_atomic_batch_rolls_back(self):
+        response = self.post([{'barcode': '67890', 'delta': 3}, {'barcode': '12345', 'delta': -6}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([result['status'] for result in response.data['results']], ['skipped', 'error'])
+        self.assertEqual(StoringInformation.objects.count(), 1)
+
+    def test_best_effort_batch(self):
+        response = self.post(
+            [{'barcode': '67890', 'delta': 3}, {'barcode': '00000', 'delta': 1}, {'barcode': '12345', 'delta': -6}],
+            mode='best_effort',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['applied'], 1)
+        self.assertEqual(response.data['failed'], 2)
+        self.assertEqual(StockBalance.objects.get(book=self.other).quantity, 3)
+        self.assertEqual(StockBalance.objects.get(book=self.book).quantity, 5)
+
+    def test_batch_rejects_zero_delta(self):
+        response = self.post([{'barcode': '12345', 'delta': 0}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SnapshotTest(TestCase):
+
+    def setUp(self):
+        self.author = Author.objects.create(name='Test Author', birth_date='1980-01-01')
+        self.book = Book.objects.create(title='Test Book', publish_year=2020, author=self.author, barcode='12345')
+        for day, quantity in [(1, 10), (5, -3), (10, 4), (15, -2), (20, 7)]:
+            entry = StoringInformation.objects.create(book=self.book, quantity=quantity)
+            StoringInformation.objects.filter(id=entry.id).update(
+                timestamp=datetime.datetime(2024, 1, day, 12, tzinfo=datetime.timezone.utc)
+            )
+
+    def moment(self, day):
+        return datetime.datetime(2024, 1, day, tzinfo=datetime.timezone.utc)
+
+    def test_build_incrementally(self):
+        self.assertEqual(build_snapshots(datetime.date(2024, 1, 12)), 3)
+        self.assertEqual(build_snapshots(datetime.date(2024, 1, 31)), 2)
+        self.assertEqual(
+            list(StockSnapshot.objects.order_by('date').values_list('date', 'quantity')),
+            [(datetime.date(2024, 1, day), quantity) for day, quantity in [(1, 10), (5, 7), (10, 11), (15, 9), (20, 16)]],
+        )
+
+    def test_balance_starts_from_snapshot(self):
+        build_snapshots(datetime.date(2024, 1, 12))
+        self.assertEqual(balance_as_of(self.book.id, self.moment(16)), 9)
+        self.assertEqual(balance_as_of(self.book.id, self.moment(10)), 7)
+
+        StockSnapshot.objects.filter(date=datetime.date(2024, 1, 10)).update(quantity=100)
+        self.assertEqual(balance_as_of(self.book.id, self.moment(16)), 98)
+
+    def add_entry(self, day, hour, quantity):
+        entry = StoringInformation.objects.create(book=self.book, quantity=quantity)
+        StoringInformation.objects.filter(id=entry.id).update(
+            timestamp=datetime.datetime(2024, 1, day, hour, tzinfo=datetime.timezone.utc)
+        )
+
+    def test_archive_keeps_balances(self):
+        self.add_entry(5, 9, 2)
+        self.add_entry(5, 18, 4)
+        call_command('build_stock_snapshots', '--until=2024-01-31', '--archive-before=2024-01-11', stdout=StringIO())
+        self.assertEqual(
+            list(StoringInformation.objects.filter(book=self.book, timestamp__lt=self.moment(11))
+                 .order_by('timestamp').values_list('timestamp', 'quantity')),
+            [(datetime.datetime(2024, 1, 1, 12, tzinfo=datetime.timezone.utc), 10),
+             (datetime.datetime(2024, 1, 5, 9, tzinfo=datetime.timezone.utc), 3),
+             (datetime.datetime(2024, 1, 10, 12, tzinfo=datetime.timezone.utc), 4)],
+        )
+        self.assertEqual(balance_as_of(self.book.id, self.moment(12)), 17)
+        self.assertEqual(StockBalance.objects.get(book=self.book).quantity, 22)
+        self.assertEqual(find_mismatched_balances(), {})
+
+    def test_history_and_rebuild_after_archive(self):
+        self.add_entry(5, 18, 5)
+        call_command('build_stock_snapshots', '--until=2024-01-31', '--archive-before=2024-01-11', stdout=StringIO())
+        url = reverse('storinginformation-history') + f'?book={self.book.id}&start=2024-01-04&end=2024-01-07'
+        data = APIClient().get(url).data
+        self.assertEqual((data['start_balance'], data['end_balance']), (10, 12))
+        self.assertEqual([entry['quantity'] for entry in data['history']], [2])
+
+        call_command('build_stock_snapshots', '--rebuild', '--until=2024-01-31', stdout=StringIO())
+        self.assertEqual(balance_as_of(self.book.id, self.moment(3)), 10)
+        self.assertEqual(balance_as_of(self.book.id, self.moment(12)), 16)
+
+    def test_archive_after_build_of_quiet_day(self):
+        call_command('build_stock_snapshots', '--until=2024-01-11', stdout=StringIO())
+        call_command('build_stock_snapshots', '--until=2024-01-11', '--archive-before=2024-01-12', stdout=StringIO())
+        self.assertEqual(built_until(), datetime.date(2024, 1, 11))
+
+    def test_until_must_be_a_finished_day(self):
+        with self.assertRaises(CommandError):
+            call_command('build_stock_snapshots', f'--until={timezone.localdate()}', stdout=StringIO())
+        self.assertFalse(StockSnapshot.objects.filter(date__gte=timezone.localdate()).exists())
+
+    def test_archive_requires_snapshots(self):
+        with self.assertRaises(CommandError):
+            call_command('build_stock_snapshots', '--until=2024-01-05', '--archive-before=2024-01-11', stdout=StringIO())
+
+
+class ReportTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+
+        first = Author.objects.create(name='First Author', birth_date='1980-01-01')
+        second = Author.objects.create(name='Second Author', birth_date='1980-01-01')
+        self.book = Book.objects.create(title='Test Book', publish_year=2020, author=first, barcode='12345')
+        self.other = Book.objects.create(title='Other Book', publish_year=2021, author=second, barcode='67890')
+        for book, day, quantity in [
+            (self.book, datetime.date(2024, 1, 3), 10),
+            (self.book, datetime.date(2024, 1, 20), -4),
+            (self.other, datetime.date(2024, 1, 20), 6),
+            (self.book, datetime.date(2024, 2, 2), 5),
+        ]:
+            entry = StoringInformation.objects.create(book=book, quantity=quantity)
+            StoringInformation.objects.filter(id=entry.id).update(
+                timestamp=datetime.datetime.combine(day, datetime.time(12), tzinfo=datetime.timezone.utc)
+            )
+
+    def test_stock_as_of(self):
+        response = self.client.get(reverse('report-stock') + '?as_of=2024-01-20')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(row['barcode'], row['balance']) for row in response.data['results']],
+                         [('12345', 6), ('67890', 6)])
+
+    def test_movements_by_author_per_month(self):
+        response = self.client.get(reverse('report-movements') + '?group=author&period=month&end=2024-01-31')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(
+            [(row['book__author__name'], row['inflow'], row['outflow'], row['net']) for row in response.data['results']],
+            [('First Author', 10, 4, 6), ('Second Author', 6, 0, 6)],
+        )
+
+    def test_movements_by_publish_year_per_day(self):
+        response = self.client.get(reverse('report-movements') + '?group=publish_year&period=day&start=2024-01-20')
+        self.assertEqual(
+            [(str(row['period']), row['book__publish_year'], row['net']) for row in response.data['results']],
+            [('2024-01-20', 2020, -4), ('2024-01-20', 2021, 6), ('2024-02-02', 2020, 5)],
+        )
+
+    def test_reports_are_cached(self):
+        url = reverse('report-stock') + '?as_of=2024-01-20'
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+    def test_movement_pages_share_one_aggregate(self):
+        url = reverse('report-movements') + '?group=publish_year&period=day'
+        first = self.client.get(url + '&limit=2')
+        self.assertEqual(first.data['count'], 4)
+        with self.assertNumQueries(0):
+            second = self.client.get(url + '&limit=2&offset=2')
+        self.assertEqual([row['net'] for row in first.data['results'] + second.data['results']], [10, -4, 6, 5])
+        self.assertIsNone(second.data['next'])
+
+    def test_invalid_report_parameters(self):
+        self.assertEqual(self.client.get(reverse('report-stock')).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse('report-movements') + '?period=year')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SearchTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+        tolkien = Author.objects.create(name='J. R. R. Tolkien', birth_date='1950-01-03')
+        herbert = Author.objects.create(name='Frank Herbert', birth_date='1950-10-08')
+        Book.objects.create(title='The Hobbit', publish_year=1937, author=tolkien, barcode='9780261102217')
+        Book.objects.create(title='The Lord of the Rings', publish_year=1954, author=tolkien, barcode='9780261103252')
+        Book.objects.create(title='Dune', publish_year=1965, author=herbert, barcode='9780441013593')
+
+    def search(self, query, **params):
+        params['q'] = query
+        response = self.client.get(reverse('book-search'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def titles(self, query):
+        return [item['title'] for item in self.search(query).data['results']]
+
+    def test_barcode_prefix(self):
+        self.assertEqual(self.titles('978026110'), ['The Hobbit', 'The Lord of the Rings'])
+
+    def test_title_substring(self):
+        self.assertEqual(self.titles('lord'), ['The Lord of the Rings'])
+
+    def test_fuzzy_title(self):
+        self.assertEqual(self.titles('hobit'), ['The Hobbit'])
+
+    def test_author_name(self):
+        self.assertEqual(self.titles('herbert'), ['Dune'])
+
+    def test_exact_barcode_ranks_first(self):
+        self.assertEqual(self.titles('9780261103252')[0], 'The Lord of the Rings')
+
+    def test_pagination(self):
+        response = self.search('978', limit=2)
+        self.assertEqual(len(response.data['results']), 2)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
+
+    def test_query_required(self):
+        self.assertEqual(self.client.get(reverse('book-search')).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_candidate_limit_keeps_best_matches(self):
+        author = Author.objects.create(name='Anonymous', birth_date='1900-01-01')
+        for n in range(5):
+            Book.objects.create(title=f'Stock Ledger {n}', publish_year=2000, author=author, barcode=f'LEDGER{n}')
+        Book.objects.create(title='Ledger', publish_year=2000, author=author, barcode='LEDGER')
+        with mock.patch('inventory.search.FALLBACK_CANDIDATE_LIMIT', 2):
+            self.assertEqual(self.titles('LEDGER'), ['Ledger', 'Stock Ledger 0'])
+
+    def test_similarity_matches_pg_trgm(self):
+        self.assertEqual(similarity('word', 'two words'), 0.36363636363636365)
+
+
+@override_settings(ALLOWED_HOSTS=['localhost'])
+class LoadTestScenarioTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        author = Author.objects.create(name='Test Author', birth_date='1980-01-01')
+        book = Book.objects.create(title='Test Book', publish_year=2020, author=author, barcode='12345')
+        StoringInformation.objects.create(book=book, quantity=100)
+
+    def test_scenarios_run_cleanly(self):
+        ctx = BenchmarkContext(bulk_rows=10, seed=1)
+        for name, scenario in SCENARIOS.items():
+            result = run_scenario(scenario, ctx, iterations=2, warmup=0)
+            self.assertEqual(result['errors'], 0, name)
+            self.assertGreater(result['queries_per_request'], 0, name)
+
+    def test_bulk_scenarios_import_every_time(self):
+        ctx = BenchmarkContext(bulk_rows=10, seed=1)
+        run_scenario(SCENARIOS['bulk_txt'], ctx, iterations=2, warmup=0)
+        self.assertEqual(StoringInformation.objects.count(), 1 + 2 * 10)
+
+
+class AsyncReadViewTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+
+        self.author = Author.objects.create(name='Test Author', birth_date='1980-01-01')
+        self.book = Book.objects.create(title='Test Book', publish_year=2020, author=self.author, barcode='12345')
+        Book.objects.create(title='Other Book', publish_year=2021, author=self.author, barcode='12399')
+        for day, quantity in [(1, 10), (5, -3), (10, 4)]:
+            entry = StoringInformation.objects.create(book=self.book, quantity=quantity)
+            StoringInformation.objects.filter(id=entry.id).update(
+                timestamp=datetime.datetime(2024, 1, day, 12, tzinfo=datetime.timezone.utc)
+            )
+
+    async def test_ping(self):
+        response = await self.async_client.get(reverse('async-ping'))
+        self.assertEqual(response.json(), {'message': 'pong'})
+
+    async def test_detail_matches_sync_view(self):
+        response = await self.async_client.get(reverse('async-book-detail', args=[self.book.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        expected = (await self.client_get(reverse('book-detail', args=[self.book.id]))).data
+        self.assertEqual(response.json(), expected)
+        self.assertEqual(response.json()['quantity'], 11)
+
+    async def test_detail_missing(self):
+        response = await self.async_client.get(reverse('async-book-detail', args=[self.book.id + 100]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_barcode_search_pages(self):
+        url = reverse('async-book-search')
+        first = (await self.async_client.get(url, {'barcode': '123', 'page_size': 1})).json()
+        self.assertEqual(first['found'], 2)
+        self.assertEqual([item['barcode'] for item in first['items']], ['12345'])
+
+        second = (await self.async_client.get(
+            url, {'barcode': '123', 'page_size': 1, 'after': first['after'], 'count': 'false'}
+        )).json()
+        self.assertIsNone(second['found'])
+        self.assertIsNone(second['after'])
+        self.assertEqual([item['barcode'] for item in second['items']], ['12399'])
+
+    async def test_history_matches_sync_view(self):
+        params = {'book': self.book.id, 'start': '2024-01-03', 'end': '2024-01-31'}
+        response = await self.async_client.get(reverse('async-history'), params)
+        expected = (await self.client_get(reverse('storinginformation-history'), params)).data
+        self.assertEqual(response.json(), json.loads(json.dumps(expected)))
+        self.assertEqual(response.json()['start_balance'], 10)
+
+    async def test_history_rejects_bad_dates(self):
+        response = await self.async_client.get(reverse('async-history'), {'book': self.book.id, 'start': 'soon'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def client_get(self, *args):
+        return await sync_to_async(self.client.get)(*args)
+
+
+class ConnectionPoolTest(SimpleTestCase):
+
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), 'pool.sqlite3')
+        self.addCleanup(close_pools)
+
+    def wrapper(self, **pool):
+        settings_dict = {**connection.settings_dict, 'ENGINE': 'inventory.backends.sqlite3', 'NAME': self.path,
+                         'POOL': {'MAX_SIZE': 1, 'TIMEOUT': 0.05, **pool}}
+        return PooledSQLiteWrapper(settings_dict, alias='pooled')
+
+    def test_connection_reused_after_close(self):
+        first = self.wrapper()
+        first.ensure_connection()
+        raw = first.connection
+        first.close()
+
+        second = self.wrapper()
+        with second.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        self.assertIs(second.connection, raw)
+        self.assertEqual(second.pool.stats, {'created': 1, 'reused': 1})
+        second.close()
+
+    def test_exhausted_pool_times_out(self):
+        first = self.wrapper()
+        first.ensure_connection()
+        with self.assertRaises(PoolTimeout):
+            self.wrapper().ensure_connection()
+        first.close()
+        self.wrapper().ensure_connection()
+
+    def test_expired_connection_replaced(self):
+        pool = ConnectionPool(max_size=1, max_lifetime=0)
+        first = pool.acquire(lambda: sqlite3.connect(self.path))
+        pool.release(first)
+        second = pool.acquire(lambda: sqlite3.connect(self.path))
+        self.assertIsNot(second, first)
+        self.assertEqual(pool.stats['closed'], 1)
+        self.assertEqual(pool.size, 1)
+
+    def test_dropped_idle_connection_replaced(self):
+        pool = ConnectionPool(max_size=1, check_after=0)
+        first = pool.acquire(lambda: sqlite3.connect(self.path))
+        pool.release(first)
+        first.close()  # The server went away while the connection sat idle.
+        second = pool.acquire(lambda: sqlite3.connect(self.path))
+        self.assertIsNot(second, first)
+        second.execute('SELECT 1')
+        self.assertEqual(pool.stats['dead'], 1)
+        self.assertEqual(pool.size, 1)
+
+        pool.release(second)
+        self.assertIs(pool.acquire(lambda: sqlite3.connect(self.path)), second)
+
+
+class ReplicaRoutingTest(TransactionTestCase):
+    # TestCase wraps every test in a transaction, which keeps reads on the primary.
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+
+        author = Author.objects.create(name='Test Author', birth_date='1980-01-01')
+        self.book = Book.objects.create(title='Test Book', publish_year=2020, author=author, barcode='12345')
+
+    @override_settings(INVENTORY_READ_REPLICAS=[])
+    def test_falls_back_to_primary(self):
+        with replica_reads():
+            self.assertEqual(Book.objects.all().db, 'default')
+
+    @override_settings(INVENTORY_READ_REPLICAS=['replica'])
+    def test_flagged_reads_use_replica(self):
+        self.assertEqual(Book.objects.all().db, 'default')
+        with replica_reads():
+            self.assertEqual(Book.objects.all().db, 'replica')
+            self.assertEqual(Book.objects.select_for_update().db, 'default')
+            with transaction.atomic():
+                self.assertEqual(Book.objects.all().db, 'default')
+
+    @override_settings(INVENTORY_READ_REPLICAS=['replica'])
+    def test_search_reads_from_replica(self):
+        with mock.patch('inventory.views.search_books', return_value=[]) as search:
+            self.client.get(reverse('book-search'), {'q': 'test'})
+            self.client.cookies[PIN_COOKIE] = '1'
+            self.client.get(reverse('book-search'), {'q': 'test'})
+        self.assertEqual([call.args[1] for call in search.call_args_list], ['replica', 'default'])
+
+    @override_settings(INVENTORY_READ_REPLICAS=['default'])
+    def test_read_your_writes(self):
+        # "default" stands in for the replica: routed reads return its alias,
+        # reads left on the primary return None.
+        routed = []
+
+        def spy(router, model, **hints):
+            routed.append(db_for_read(router, model, **hints))
+            return routed[-1]
+
+        db_for_read = ReplicaRouter.db_for_read
+        with mock.patch.object(ReplicaRouter, 'db_for_read', spy):
+            self.client.get(reverse('book-detail', args=[self.book.id]))
+            self.assertIn('default', routed)
+
+            response = self.client.post(reverse('storinginformation-add'), {'barcode': '12345', 'quantity': 5})
+            self.assertIn(PIN_COOKIE, response.cookies)
+
+            routed.clear()
+            cache.clear()
+            response = self.client.get(reverse('book-detail', args=[self.book.id]))
+            self.assertEqual(response.data['quantity'], 5)
+            self.assertTrue(routed)
+            self.assertNotIn('default', routed)
+
+
+@override_settings(INVENTORY_ADD_BUFFER=True, INVENTORY_ADD_BUFFER_SIZE=3, INVENTORY_ADD_BUFFER_INTERVAL=0)
+class StockBufferTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(close_buffer)
+        self.client = APIClient()
+
+        self.author = Author.objects.create(name='Test Author', birth_date='1980-01-01')
+        self.book = Book.objects.create(title='Test Book', publish_year=2020, author=self.author, barcode='12345')
+        StoringInformation.objects.create(book=self.book, quantity=5)
+
+    def add(self, quantity):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('storinginformation-add'), {'barcode': '12345', 'quantity': quantity},
+                                    format='json')
+
+    def test_additions_are_coalesced_per_book(self):
+        for quantity in (1, 2):
+            self.assertEqual(self.add(quantity).status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(StoringInformation.objects.count(), 1)
+        self.assertEqual(StockBalance.objects.get(book=self.book).quantity, 5)
+        self.assertEqual(get_balance(self.book.id), 8)
+        self.assertEqual(self.client.get(reverse('book-detail', args=[self.book.id])).data['quantity'], 8)
+
+        self.add(3)
+        self.assertEqual(list(StoringInformation.objects.order_by('id').values_list('quantity', flat=True)), [5, 6])
+        self.assertEqual(StockBalance.objects.get(book=self.book).quantity, 11)
+        self.assertEqual(get_balance(self.book.id), 11)
+
+    def test_unknown_barcode(self):
+        response = self.client.post(reverse('storinginformation-add'), {'barcode': '00000', 'quantity': 1},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_buffered_additions_change_etag(self):
+        url = reverse('book-detail', args=[self.book.id])
+        etag = self.client.get(url)['ETag']
+        self.add(1)
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['quantity'], 6)
+
+    def test_remove_sees_buffered_additions(self):
+        self.add(2)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('storinginformation-remove'), {'barcode': '12345', 'quantity': 7},
+                                        format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(StockBalance.objects.get(book=self.book).quantity, 0)
+
+    def test_remove_flushes_only_its_book(self):
+        other = Book.objects.create(title='Other Book', publish_year=2020, author=self.author, barcode='67890')
+        self.add(2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('storinginformation-add'), {'barcode': '67890', 'quantity': 3}, format='json')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('storinginformation-remove'), {'barcode': '12345', 'quantity': 1},
+                             format='json')
+        self.assertEqual(StockBalance.objects.get(book=self.book).quantity, 6)
+        self.assertFalse(StockBalance.objects.filter(book=other).exists())
+        self.assertEqual(get_balance(other.id), 3)
+
+    def test_keyed_addition_is_not_buffered(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('storinginformation-add'), {'barcode': '12345', 'quantity': 2},
+                                        format='json', headers={'Idempotency-Key': 'scan-1'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(StockBalance.objects.get(book=self.book).quantity, 7)
+        self.assertEqual(get_buffer().delta(self.book.id), 0)
+
+    @override_settings(WEB_CONCURRENCY=4)
+    def test_refused_with_several_workers(self):
+        with self.assertRaises(ImproperlyConfigured):
+            get_buffer()
+        self.assertEqual([error.id for error in add_buffer_check(None)], ['inventory.E001'])
+
+    def test_flushed_deltas_counted_until_commit(self):
+        buffer = StockBuffer(max_size=100, interval=0)
+        buffer.append(self.book.id, 4)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(buffer.flush(), 1)
+            self.assertEqual(buffer.delta(self.book.id), 4)
+            self.assertTrue(StoringInformation.objects.filter(quantity=4).exists())
+        self.assertEqual(buffer.delta(self.book.id), 0)
+
+    def test_failed_flush_keeps_deltas(self):
+        buffer = StockBuffer(max_size=100, interval=0)
+        buffer.append(self.book.id, 4)
+        with mock.patch.object(StoringInformation.objects, 'bulk_create', side_effect=RuntimeError('down')):
+            with self.assertRaises(RuntimeError):
+                buffer.flush()
+        self.assertEqual(buffer.delta(self.book.id), 4)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(buffer.delta(self.book.id), 0)
+        self.assertEqual(StockBalance.objects.get(book=self.book).quantity, 9)
+
+    def test_close_flushes(self):
+        self.add(4)
+        close_buffer()
+        self.assertEqual(StockBalance.objects.get(book=self.book).quantity, 9)
+        self.assertEqual(get_balance(self.book.id), 9)
+
+    @override_settings(INVENTORY_ADD_BUFFER=False)
+    def test_disabled_by_default(self):
+        self.assertIsNone(get_buffer())
+        self.assertEqual(self.add(1).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(StockBalance.objects.get(book=self.book).quantity, 6)
+
+
+@override_settings(INVENTORY_PERF_ENABLED=True, INVENTORY_PERF_SAMPLE_RATE=1.0)
+class PerformanceMiddlewareTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        metrics.clear()
+
+        author = Author.objects.create(name='Test Author', birth_date='1980-01-01')
+        self.book = Book.objects.create(title='Test Book', publish_year=2020, author=author, barcode='12345')
+
+    def test_server_timing_and_metrics(self):
+        with self.assertLogs('inventory.perf', level='INFO') as logs:
+            response = self.client.get(reverse('book-detail', args=[self.book.id]))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+        self.assertIn('render;dur=', response['Server-Timing'])
+
+        logged = json.loads(logs.records[0].getMessage())
+        self.assertEqual(logged['route'], 'book-detail')
+        self.assertEqual(logged['bytes'], len(response.content))
+
+        with self.assertLogs('inventory.perf', level='INFO'):
+            stats = self.client.get(reverse('perf-metrics')).data
+        self.assertEqual(list(stats), ['book-detail'])
+        self.assertEqual(stats['book-detail']['count'], 1)
+        self.assertEqual(stats['book-detail']['queries_mean'], 2)
+
+    def test_serializer_time_reported_separately(self):
+        with self.assertLogs('inventory.perf', level='INFO') as logs:
+            self.client.get(reverse('author-list'))
+        logged = json.loads(logs.records[0].getMessage())
+        self.assertGreater(logged['serialize_ms'], 0)
+        self.assertIn('render_ms', logged)
+
+        # Nested serializers are timed once, by the outermost one.
+        timer = SerializeTimer()
+        with mock.patch('inventory.middleware.time.perf_counter', side_effect=[1.0, 3.0]):
+            with timer, timer:
+                pass
+        self.assertEqual(timer.elapsed, 2.0)
+
+    @override_settings(INVENTORY_PERF_ENABLED=False)
+    def test_disabled(self):
+        response = self.client.get(reverse('ping'))
+        self.assertNotIn('Server-Timing', response)
@@ -1,15 +1,24 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from .views import AuthorViewSet, BookViewSet, StoringInformationViewSet
-from .views import ping
+from . import async_views
+from .views import AuthorViewSet, BookViewSet, ImportJobViewSet, ReportViewSet, StoringInformationViewSet
+from .views import cache_stats_view, perf_metrics, ping
 
 router = DefaultRouter()
 router.register(r'author', AuthorViewSet)
 router.register(r'book', BookViewSet)
 router.register(r'leftover', StoringInformationViewSet)
+router.register(r'job', ImportJobViewSet)
+router.register(r'report', ReportViewSet, basename='report')
 
 urlpatterns = [
     path('', include(router.urls)),
     path('ping', ping, name='ping'),
+    path('cache/stats', cache_stats_view, name='cache-stats'),
+    path('metrics', perf_metrics, name='perf-metrics'),
+    path('async/ping', async_views.ping, name='async-ping'),
+    path('async/book/', async_views.book_search, name='async-book-search'),
+    path('async/book/<int:pk>/', async_views.book_detail, name='async-book-detail'),
+    path('async/leftover/history/', async_views.history, name='async-history'),
 ]
@@ -1,15 +1,53 @@
+import hashlib
 from datetime import datetime
+from urllib.parse import urlencode
 
-import openpyxl
-
+from django.conf import settings
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.db.models import Q
-from rest_framework import viewsets, status
+from django.utils import timezone
+from rest_framework import mixins, viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action, api_view
 
-from .models import Author, Book, StoringInformation
+from .models import Author, Book, ImportJob, StoringInformation
 from .serializers import AuthorSerializer, BookSerializer, StoringInformationSerializer, BookStoringSerializer
+from .serializers import BOOK_READ_FIELDS, ImportJobSerializer, MovementBatchSerializer, RemovalSerializer
+from .serializers import book_representation
+from .buffer import buffered_delta, flush_buffer, get_buffer
+from .cache import book_detail_key, book_generation, book_validators_key, cache_stats, cached
+from .conditional import ConditionalReadMixin, make_etag
+from .exports import BOOK_EXPORT_FIELDS, EXPORT_FORMATS, LEDGER_EXPORT_FIELDS, book_export_rows
+from .exports import ledger_export_rows, streaming_export
+from .history import iter_history
+from .idempotency import file_digest, idempotent, request_fingerprint
+from .imports import import_rows
+from .jobs import enqueue_import
+from .middleware import metrics, timed_serialization
+from .pagination import BarcodePagination, KeysetPagination, RankedPagination, ReportPagination
+from .parsers import PARSERS
+from .renderers import BULK_RENDERER_CLASSES
+from .reports import GROUPS, PERIODS, movement_report, stock_report
+from .routing import ReplicaReadMixin
+from .search import search_books
+from .snapshots import balance_as_of
+from .stock import InsufficientStock, apply_movements, get_balance, prime_balance, remove_stock
+
+
+def parse_day(value):
+    if not value:
+        return None
+    return timezone.make_aware(datetime.strptime(value, '%Y-%m-%d'))
+
+
+def export_response(request, fields, rows, filename):
+    # ``Accept: application/msgpack`` (or the columnar type) picks the matching stream.
+    default = request.accepted_renderer.format if request.accepted_renderer.format in EXPORT_FORMATS else 'ndjson'
+    output = request.query_params.get('output', default)
+    if output not in EXPORT_FORMATS:
+        return Response({'error': 'Unsupported export format'}, status=status.HTTP_400_BAD_REQUEST)
+    return streaming_export(fields, rows, output, filename)
 
 
 @api_view(['GET'])
@@ -17,104 +55,229 @@ def ping(request):
     return Response({'message': 'pong'})
 
 
-class AuthorViewSet(viewsets.ModelViewSet):
+@api_view(['GET'])
+def cache_stats_view(request):
+    return Response(cache_stats())
+
+
+@api_view(['GET'])
+def perf_metrics(request):
+    return Response(metrics.snapshot())
+
+
+class AuthorViewSet(ReplicaReadMixin, ConditionalReadMixin, viewsets.ModelViewSet):
     queryset = Author.objects.all()
     serializer_class = AuthorSerializer
+    pagination_class = KeysetPagination
+    renderer_classes = BULK_RENDERER_CLASSES
+
+    def retrieve(self, request, *args, **kwargs):
+        updated_at = get_object_or_404(self.get_queryset().values_list('updated_at', flat=True), pk=kwargs['pk'])
+        etag = make_etag('author', kwargs['pk'], updated_at)
+        return self.conditional(request, etag, updated_at, lambda: super(AuthorViewSet, self).retrieve(
+            request, *args, **kwargs
+        ))
 
 
-class BookViewSet(viewsets.ModelViewSet):
-    queryset = Book.objects.all()
+class BookViewSet(ReplicaReadMixin, ConditionalReadMixin, viewsets.ModelViewSet):
+    queryset = Book.objects.select_related('author')
     serializer_class = BookSerializer
+    pagination_class = KeysetPagination
+    renderer_classes = BULK_RENDERER_CLASSES
+    replica_actions = ('list', 'retrieve', 'search')
 
     def list(self, request, *args, **kwargs):
         barcode = request.query_params.get('barcode', None)
         if barcode is not None:
-            books = self.queryset.filter(Q(barcode__startswith=barcode)).order_by('barcode')
-            serializer = self.get_serializer(books, many=True)
-            return Response({'found': len(books), 'items': serializer.data})
+            books = self.get_queryset().filter(Q(barcode__startswith=barcode))
+            paginator = BarcodePagination()
+            page = self.book_page(books, paginator)
+            return self.conditional_page(paginator, page, lambda: Response({
+                'found': paginator.count,
+                'next': paginator.get_next_link(),
+                'previous': paginator.get_previous_link(),
+                'items': self.represent_books(page),
+            }))
         else:
-            return super().list(request, *args, **kwargs)
+            books = self.filter_queryset(self.get_queryset())
+            page = self.book_page(books, self.paginator)
+            return self.conditional_page(self.paginator, page, lambda: self.paginator.get_paginated_response(
+                self.represent_books(page)
+            ))
+
+    def book_page(self, queryset, paginator):
+        if settings.INVENTORY_LEAN_READS:
+            queryset = queryset.values(*BOOK_READ_FIELDS, 'updated_at', 'author__updated_at')
+        return paginator.paginate_queryset(queryset, self.request, view=self)
+
+    def represent_books(self, page):
+        with timed_serialization():
+            if settings.INVENTORY_LEAN_READS:
+                return [book_representation(row) for row in page]
+            return self.get_serializer(page, many=True).data
+
+    def page_validators(self, row):
+        if isinstance(row, dict):
+            return row['id'], row['updated_at'], row['author__updated_at']
+        return row.id, row.updated_at, row.author.updated_at
 
     def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        serializer_data = self.get_serializer(instance).data
-
-        quantity = 0
-        storing_info = StoringInformation.objects.filter(book=instance)
-
-        for storing in storing_info:
-            quantity += storing.quantity
-        serializer_data['quantity'] = quantity
+        try:
+            book_id = int(kwargs['pk'])
+        except ValueError:
+            raise Http404
+
+        etag, last_modified = cached('validators', book_validators_key(book_id), lambda: self.validators(book_id),
+                                     book_id=book_id)
+        buffered = buffered_delta(book_id)
+        if buffered:
+            # Buffered additions change the balance without touching the row.
+            etag, last_modified = make_etag(etag, buffered), None
+        return self.conditional(request, etag, last_modified, lambda: self.detail_response(book_id))
+
+    def validators(self, book_id):
+        generation = book_generation(book_id)
+        row = Book.objects.filter(pk=book_id).values_list(
+            'updated_at', 'author__updated_at', 'stock__version', 'stock__updated_at', 'stock__quantity',
+        ).first()
+        if row is None:
+            raise Http404
+        book_updated, author_updated, stock_version, stock_updated, quantity = row
+        # The row carries the balance too; spare get_balance its query.
+        prime_balance(book_id, quantity or 0, generation)
+        etag = make_etag('book', book_id, book_updated, author_updated, stock_version)
+        return etag, max(moment for moment in (book_updated, author_updated, stock_updated) if moment)
+
+    def detail_response(self, book_id):
+        serializer_data = dict(cached('book', book_detail_key(book_id), lambda: dict(
+            self.get_serializer(self.get_object()).data
+        ), book_id=book_id))
+        serializer_data['quantity'] = get_balance(book_id)
 
         return Response(serializer_data)
 
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        return export_response(request, BOOK_EXPORT_FIELDS, book_export_rows(), 'books')
 
-class StoringInformationViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = RankedPagination()
+        # The router picks a replica for this action unless the client is pinned.
+        page = paginator.paginate_queryset(search_books(query, self.get_queryset().db), request, view=self)
+        with timed_serialization():
+            results = [dict(book_representation(row), rank=round(row['rank'], 4)) for row in page]
+        return paginator.get_paginated_response(results)
+
+
+# Ledger rows are append-only: the materialized balance only follows inserts,
+# so there is no update or destroy.
+class StoringInformationViewSet(ReplicaReadMixin, mixins.CreateModelMixin, mixins.ListModelMixin,
+                                mixins.RetrieveModelMixin, viewsets.GenericViewSet):
     queryset = StoringInformation.objects.all()
     serializer_class = StoringInformationSerializer
+    pagination_class = KeysetPagination
+    renderer_classes = BULK_RENDERER_CLASSES
+    replica_actions = ('list', 'retrieve', 'history')
+
+    def idempotent(self, request, scope, respond):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return respond()
+        return idempotent(f'{scope}:{key}', request_fingerprint(request.data), respond)
 
     @action(detail=False, methods=['post'])
     def add(self, request):
+        return self.idempotent(request, 'add', lambda: self.add_stock(request))
+
+    def add_stock(self, request):
         barcode = request.data.get('barcode')
         quantity = request.data.get('quantity', 0)
 
+        # A keyed addition is stored with its Idempotency-Key record, so a
+        # replayed 2xx always means the quantity is in the ledger.
+        buffer = None if request.headers.get('Idempotency-Key') else get_buffer()
+        if buffer is not None:
+            book_id = Book.objects.filter(barcode=barcode).values_list('id', flat=True).first()
+            if book_id is None:
+                raise Http404
+            buffer.add(book_id, int(quantity))
+            return Response({'status': 'quantity queued'}, status=status.HTTP_202_ACCEPTED)
+
         book = get_object_or_404(Book, barcode=barcode)
         StoringInformation.objects.create(book=book, quantity=quantity)
         return Response({'status': 'quantity added'}, status=status.HTTP_201_CREATED)
 
     @action(detail=False, methods=['post'])
     def remove(self, request):
-        barcode = request.data.get('barcode')
-        quantity = int(request.data.get('quantity', 0))
+        serializer = RemovalSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        barcode, quantity = serializer.validated_data['barcode'], serializer.validated_data['quantity']
 
-        book = get_object_or_404(Book, barcode=barcode)
+        # Removals are checked against the stored balance.
+        if get_buffer() is not None:
+            flush_buffer(Book.objects.filter(barcode=barcode).values_list('id', flat=True))
+        return self.idempotent(request, 'remove', lambda: self.remove_stock(barcode, quantity))
 
-        quantity_end = 0
-        storing_info = StoringInformation.objects.filter(book=book)
-
-        for storing in storing_info:
-            quantity_end += storing.quantity
+    def remove_stock(self, barcode, quantity):
+        book = get_object_or_404(Book, barcode=barcode)
 
-        if quantity_end - quantity < 0:
+        try:
+            remove_stock(book, quantity)
+        except InsufficientStock:
             return Response({'error': 'quantity is not enough'}, status=status.HTTP_400_BAD_REQUEST)
-
-        StoringInformation.objects.create(book=book, quantity=-quantity)
         return Response({'status': 'quantity removed'}, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        serializer = MovementBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        atomic = serializer.validated_data['mode'] == MovementBatchSerializer.ATOMIC
+        flush_buffer()
+        results, committed = apply_movements(serializer.validated_data['movements'], atomic=atomic)
+        applied = sum(result['status'] == 'applied' for result in results)
+        return Response(
+            {'applied': applied, 'failed': sum(result['status'] == 'error' for result in results), 'results': results},
+            status=status.HTTP_201_CREATED if committed else status.HTTP_400_BAD_REQUEST,
+        )
+
     @action(detail=False, methods=['get'])
     def history(self, request):
         start_date = request.query_params.get('start', None)
         end_date = request.query_params.get('end', None)
         book_key = request.query_params.get('book', None)
 
-        if start_date:
-            start_date = datetime.strptime(start_date, '%Y-%m-%d')
-        if end_date:
-            end_date = datetime.strptime(end_date, '%Y-%m-%d')
-
-        history_query = StoringInformation.objects.all()
+        start_date = parse_day(start_date)
+        end_date = parse_day(end_date)
 
         book = get_object_or_404(Book, id=book_key)
+        start_balance = balance_as_of(book.id, start_date)
 
-        if book_key:
-            history_query = history_query.filter(book__id=book_key)
-        if start_date:
-            history_query = history_query.filter(timestamp__gte=start_date)
-        if end_date:
-            history_query = history_query.filter(timestamp__lte=end_date)
-
+        history = list(iter_history(book.id, start_date, end_date, opening=start_balance))
         history_data = {
             "book": BookStoringSerializer(book).data,
-            "start_balance": history_query.first().quantity if history_query.first() else 0,
-            "history": []
+            "start_balance": start_balance,
+            "end_balance": history[-1]['balance'] if history else start_balance,
+            "history": history,
         }
-        end_balance = 0
-        for storing_info in history_query:
-            end_balance += storing_info.quantity
-            history_data['history'].append(self.get_serializer(storing_info).data)
-        history_data['end_balance'] = end_balance
         return Response(history_data)
 
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        try:
+            start_date = parse_day(request.query_params.get('start'))
+            end_date = parse_day(request.query_params.get('end'))
+        except ValueError:
+            return Response({'error': 'Dates must be in YYYY-MM-DD format'}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = ledger_export_rows(start_date, end_date, request.query_params.get('book'))
+        return export_response(request, LEDGER_EXPORT_FIELDS, rows, 'ledger')
+
     @action(detail=False, methods=['post'])
     def bulk(self, request):
         uploaded_file = request.FILES.get('file')
@@ -123,71 +286,86 @@ class StoringInformationViewSet(viewsets.ModelViewSet):
             try:
                 file_extension = uploaded_file.name.split('.')[-1].lower()
 
-                if file_extension == 'xls' or file_extension == 'xlsx':
-                    data = self.parse_excel_file(uploaded_file)
-                elif file_extension == 'txt':
-                    data = self.parse_txt_file(uploaded_file)
-                else:
+                parser = PARSERS.get(file_extension)
+                if parser is None:
                     return Response({'error': 'Unsupported file format'}, status=status.HTTP_400_BAD_REQUEST)
 
-                serializer = self.get_serializer(data=data, many=True)
-                if serializer.is_valid():
-                    serializer.save()
+                def respond():
+                    return self.import_upload(request, uploaded_file, file_extension, parser)
 
-                return Response(data, status=status.HTTP_200_OK)
+                # Retried uploads of the same file replay the first result
+                # instead of counting the stock again.
+                if request.query_params.get('dedupe') in ('0', 'false'):
+                    return respond()
+                digest = file_digest(uploaded_file)
+                key = request.headers.get('Idempotency-Key')
+                return idempotent(f'bulk:{key}' if key else f'bulk:sha256:{digest}', digest, respond)
             except Exception as e:
                 return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({'error': 'No file uploaded'}, status=status.HTTP_400_BAD_REQUEST)
 
-    def parse_excel_file(self, uploaded_file):
-        data = []
+    def import_upload(self, request, uploaded_file, file_extension, parser):
         try:
-            workbook = openpyxl.load_workbook(uploaded_file)
-            sheet = workbook.active
+            if request.query_params.get('async') in ('1', 'true'):
+                job = enqueue_import(uploaded_file, file_extension)
+                return Response({'job': job.id, 'status': job.status}, status=status.HTTP_202_ACCEPTED)
 
-            for row in sheet.iter_rows(min_row=1):
-                barcode_cell, quantity_cell = row[:2]
-                barcode = barcode_cell.value
-                if barcode is not None:
-                    barcode = str(barcode).strip()
+            result = import_rows(parser(uploaded_file))
+            return Response(result.as_dict(), status=status.HTTP_200_OK)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-                quantity = quantity_cell.value
 
-                if not barcode:
-                    continue
+class ImportJobViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    queryset = ImportJob.objects.all()
+    serializer_class = ImportJobSerializer
 
-                try:
-                    quantity = int(quantity)
-                except ValueError:
-                    raise ValueError(f'Row {barcode_cell.row}: Quantity must be a valid integer')
 
-                book = get_object_or_404(Book, barcode=barcode)
-                data.append({'book': book.id, 'quantity': quantity})
+class ReportViewSet(ReplicaReadMixin, viewsets.ViewSet):
+    replica_actions = ('stock', 'movements')
 
-        except Exception as e:
-            raise e
-
-        return data
-
-    def parse_txt_file(self, uploaded_file):
-        data = []
-        lines = uploaded_file.read().decode('utf-8').splitlines()
-        current_barcode = None
-
-        for line in lines:
-            line = line.strip()
-
-            if line.startswith("BRC"):
-                current_barcode = line[3:]
-            elif line.startswith("QNT"):
-                try:
-                    if current_barcode != "":
-                        current_quantity = int(line[3:])
-                        book = get_object_or_404(Book, barcode=current_barcode)
-                        data.append({'book': book.id, 'quantity': current_quantity})
-                        current_barcode = ""
-                except ValueError:
-                    raise ValueError(f'Invalid quantity format: {line}')
-
-        return data
+    def cached_report(self, request, compute, ignore=()):
+        params = urlencode([(key, value) for key, value in sorted(request.query_params.lists()) if key not in ignore],
+                           doseq=True)
+        key = 'inventory:report:' + hashlib.sha256(f'{request.path}?{params}'.encode()).hexdigest()
+        return cached('report', key, compute, timeout=settings.INVENTORY_REPORT_CACHE_TIMEOUT)
+
+    @action(detail=False, methods=['get'])
+    def stock(self, request):
+        try:
+            as_of = datetime.strptime(request.query_params['as_of'], '%Y-%m-%d').date()
+        except (KeyError, ValueError):
+            return Response({'error': 'as_of must be a YYYY-MM-DD date'}, status=status.HTTP_400_BAD_REQUEST)
+
+        def compute():
+            paginator = KeysetPagination()
+            page = paginator.paginate_queryset(stock_report(as_of), request, view=self)
+            return paginator.get_paginated_response(page).data
+
+        return Response(self.cached_report(request, compute))
+
+    @action(detail=False, methods=['get'])
+    def movements(self, request):
+        group = request.query_params.get('group', 'author')
+        period = request.query_params.get('period', 'day')
+        if group not in GROUPS or period not in PERIODS:
+            return Response(
+                {'error': f'group must be one of {", ".join(GROUPS)}; period one of {", ".join(PERIODS)}'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            start, end = (
+                datetime.strptime(value, '%Y-%m-%d').date() if value else None
+                for value in (request.query_params.get('start'), request.query_params.get('end'))
+            )
+        except ValueError:
+            return Response({'error': 'Dates must be in YYYY-MM-DD format'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # The aggregate is cached once for every page: paging slices the list
+        # instead of repeating the GROUP BY (and a COUNT over it) per page.
+        paginator = ReportPagination()
+        rows = self.cached_report(request, lambda: list(movement_report(group, period, start, end)),
+                                  ignore=(paginator.limit_query_param, paginator.offset_query_param))
+        page = paginator.paginate_queryset(rows, request, view=self)
+        return paginator.get_paginated_response(page)